@@ -0,0 +1,137 @@
+"""Индекс названий произведений в памяти процесса для автодополнения."""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+from reviews.models import Title
+
+from .cache import new_version
+
+VERSION_KEY = 'title-names-version'
+CHANGE_KEY = 'title-names-change:{version}'
+
+
+def fold(name):
+    return name.casefold()
+
+
+class PrefixIndex:
+    """Названия в порядке casefold: поиск по префиксу — bisect по списку.
+
+    Ключи и id хранятся параллельными списком и массивом, без кортежа
+    на каждое произведение: для миллиона названий это заметная память.
+
+    Индекс строится при первом запросе и обновляется по журналу
+    изменений в общем кэше: каждое изменение названия получает номер
+    версии, и процессы применяют чужие изменения, не перечитывая все
+    произведения. Если журнал не полон (вытеснен, массовая запись),
+    индекс строится заново.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []
+        self.ids = array('q')
+        self.names = {}
+        self.version = None
+
+    def load(self):
+        """Строит индекс заново по основной базе."""
+        version = current_version()
+        names = dict(
+            Title.objects.using(router.db_for_write(Title))
+            .values_list('pk', 'name').iterator()
+        )
+        ordered = sorted((fold(name), pk) for pk, name in names.items())
+        self.keys = [key for key, _ in ordered]
+        self.ids = array('q', (pk for _, pk in ordered))
+        self.names = names
+        self.version = version
+
+    def apply(self, pk, name):
+        """Добавляет, переименовывает (name) или удаляет (None) название."""
+        old = self.names.pop(pk, None)
+        if old is not None:
+            position = bisect_left(self.keys, fold(old))
+            while self.ids[position] != pk:
+                position += 1
+            del self.keys[position]
+            del self.ids[position]
+        if name is not None:
+            key = fold(name)
+            position = bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.ids.insert(position, pk)
+            self.names[pk] = name
+
+    def sync(self):
+        version = current_version()
+        if self.version == version:
+            return
+        missed = (range(self.version + 1, version + 1)
+                  if self.version is not None else ())
+        if (not missed or len(missed) > settings.AUTOCOMPLETE_JOURNAL_SIZE):
+            self.load()
+            return
+        keys = [CHANGE_KEY.format(version=number) for number in missed]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            self.load()
+            return
+        for key in keys:
+            self.apply(*changes[key])
+        self.version = version
+
+    def lookup(self, prefix, limit):
+        """[(id, название)] с названиями, начинающимися на prefix."""
+        prefix = fold(prefix)
+        with self.lock:
+            self.sync()
+            found = []
+            position = bisect_left(self.keys, prefix)
+            end = position + limit
+            for key, pk in zip(self.keys[position:end],
+                               self.ids[position:end]):
+                if not key.startswith(prefix):
+                    break
+                found.append((pk, self.names[pk]))
+            return found
+
+    def changed(self, pk, name):
+        """Записывает изменение в журнал и применяет его к своему индексу."""
+        version = next_version()
+        # incr файлового кэша не атомарен: два процесса могут получить
+        # один номер, тогда второй берёт следующий
+        while not cache.add(CHANGE_KEY.format(version=version), (pk, name)):
+            version = next_version()
+        with self.lock:
+            if self.version == version - 1:
+                self.apply(pk, name)
+                self.version = version
+
+    def reset(self):
+        """После массовой записи все процессы строят индекс заново."""
+        cache.set(VERSION_KEY, new_version(), timeout=None)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, new_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def next_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, new_version(), timeout=None)
+        return cache.get(VERSION_KEY)
+
+
+TITLE_NAMES = PrefixIndex()
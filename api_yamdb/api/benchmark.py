@@ -0,0 +1,413 @@
+"""Замеры задержки и числа SQL-запросов эндпоинтов API."""
+import itertools
+import json
+import multiprocessing
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+
+from reviews.models import Comment, Review, Title
+
+from .middleware import QueryCollector, collect_queries
+
+PERCENTILES = (50, 95, 99)
+# настройки SQLite по умолчанию: журнал отката, без mmap, новое
+# соединение на каждый запрос
+BASELINE_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'mmap_size': 0,
+    'cache_size': -2000,
+    'temp_store': 'DEFAULT',
+}
+READERS = 4
+
+
+def percentiles(values):
+    """p50/p95/p99 в миллисекундах."""
+    if len(values) < 2:
+        return {f'p{p}': round(values[0] * 1000, 2) for p in PERCENTILES}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {f'p{p}': round(cuts[p - 1] * 1000, 2) for p in PERCENTILES}
+
+
+def measure(request, repeat, warmup=1):
+    """Выполняет request() repeat раз и возвращает сводку замеров.
+
+    request — функция без аргументов, возвращающая ответ клиента.
+    """
+    for _ in range(warmup):
+        request()
+    durations = []
+    queries = []
+    statuses = set()
+    for _ in range(repeat):
+        collector = QueryCollector()
+        started = time.perf_counter()
+        with collect_queries(collector):
+            response = request()
+        durations.append(time.perf_counter() - started)
+        queries.append(collector.count)
+        statuses.add(response.status_code)
+    return {
+        **percentiles(durations),
+        'queries': max(queries),
+        'status': sorted(statuses),
+    }
+
+
+def api_paths():
+    """Пути для замеров, выбранные по имеющимся в базе данным.
+
+    Берутся самое обсуждаемое произведение и самый комментируемый
+    отзыв, чтобы замеры отражали худший случай перекоса данных.
+    """
+    paths = {
+        'categories': '/api/v1/categories/',
+        'genres': '/api/v1/genres/',
+        'titles': '/api/v1/titles/',
+        'titles_cursor': '/api/v1/titles/?pagination=cursor',
+    }
+    title = Title.objects.order_by('-rating_count').first()
+    if title is None:
+        return paths
+    titles = Title.objects.count()
+    reviews = f'/api/v1/titles/{title.pk}/reviews/'
+    paths.update({
+        'titles_last_page': f'/api/v1/titles/?page={max(titles // 4, 1)}',
+        'title_detail': f'/api/v1/titles/{title.pk}/',
+        'reviews': reviews,
+        'reviews_last_page':
+            f'{reviews}?page={max(title.rating_count // 4, 1)}',
+        'reviews_cursor': f'{reviews}?pagination=cursor',
+    })
+    review = (Review.objects.annotate(comment_count=Count('comments'))
+              .order_by('-comment_count').first())
+    if review is not None:
+        paths.update({
+            'review_detail':
+                f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/',
+            'comments': (f'/api/v1/titles/{review.title_id}/reviews/'
+                         f'{review.pk}/comments/'),
+        })
+    return paths
+
+
+def api_scenario(repeat):
+    """Чтение основных списков и карточек анонимным пользователем."""
+    client = Client()
+    return {name: measure(lambda path=path: client.get(path), repeat)
+            for name, path in api_paths().items()}
+
+
+def read_worker(paths, repeat, results):
+    client = Client(raise_request_exception=False)
+    durations = []
+    errors = 0
+    for step in range(repeat):
+        started = time.perf_counter()
+        response = client.get(paths[step % len(paths)])
+        durations.append(time.perf_counter() - started)
+        errors += response.status_code >= 500
+    connections.close_all()
+    results.put(('read', durations, errors))
+
+
+def write_worker(review_ids, title_ids, done, results):
+    writes = errors = 0
+    while not done.is_set():
+        # записи без изменения данных, но с блокировкой базы: отзыв
+        # и пересчёт рейтинга пачки произведений
+        try:
+            Review.objects.get(
+                pk=random.choice(review_ids)
+            ).save(update_fields=['text'])
+            Title.objects.filter(
+                pk__in=random.sample(title_ids, min(len(title_ids), 50))
+            ).refresh_ratings()
+            writes += 2
+        except OperationalError:
+            errors += 1
+    connections.close_all()
+    results.put(('write', writes, errors))
+
+
+def mixed_load(repeat, readers=READERS):
+    """READERS процессов читают API, один процесс пишет.
+
+    Процессы, а не потоки: так конкурируют за файл базы воркеры
+    gunicorn, и замер не упирается в GIL. Нужен fork, чтобы дочерние
+    процессы унаследовали настроенный Django и переопределённые настройки.
+    """
+    paths = api_paths()
+    read_paths = [paths['titles'], paths.get('reviews', paths['titles'])]
+    review_ids = list(Review.objects.values_list('pk', flat=True)[:100])
+    title_ids = list(Title.objects.values_list('pk', flat=True)[:1000])
+    if not review_ids:
+        return {}
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    done = context.Event()
+    connections.close_all()
+    writer = context.Process(target=write_worker,
+                             args=(review_ids, title_ids, done, results))
+    workers = [context.Process(target=read_worker,
+                               args=(read_paths, repeat, results))
+               for _ in range(readers)]
+    started = time.perf_counter()
+    writer.start()
+    for worker in workers:
+        worker.start()
+    durations = []
+    errors = writes = 0
+    for _ in workers:
+        _, worker_durations, worker_errors = results.get()
+        durations.extend(worker_durations)
+        errors += worker_errors
+    elapsed = time.perf_counter() - started
+    done.set()
+    _, writes, write_errors = results.get()
+    for process in (writer, *workers):
+        process.join()
+    return {
+        **percentiles(durations),
+        'reads_per_sec': round(len(durations) / elapsed, 1),
+        'writes_per_sec': round(writes / elapsed, 1),
+        'errors': errors + write_errors,
+    }
+
+
+def sqlite_scenario(repeat):
+    """Смешанная нагрузка с настройками SQLite по умолчанию и с нашими.
+
+    Имеет смысл только для базы в файле: WAL и mmap к памяти неприменимы.
+    """
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return {}
+    database = connections.settings[connection.alias]
+    conn_max_age = database['CONN_MAX_AGE']
+    results = {}
+    try:
+        for name, pragmas, max_age in (
+            ('baseline', BASELINE_PRAGMAS, 0),
+            ('tuned', settings.SQLITE_PRAGMAS, conn_max_age),
+        ):
+            database['CONN_MAX_AGE'] = max_age
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                # новое соединение выставит PRAGMA, journal_mode меняется
+                # только пока других соединений с базой нет
+                connections.close_all()
+                results[name] = mixed_load(repeat)
+    finally:
+        database['CONN_MAX_AGE'] = conn_max_age
+        connections.close_all()
+    return results
+
+
+def drop_indexes(models):
+    for model in models:
+        for index in model._meta.indexes:
+            with connection.schema_editor() as editor:
+                editor.remove_index(model, index)
+
+
+def create_indexes(models):
+    for model in models:
+        for index in model._meta.indexes:
+            with connection.schema_editor() as editor:
+                editor.add_index(model, index)
+
+
+def indexes_scenario(repeat):
+    """Отзывы и комментарии самого обсуждаемого произведения
+    с составными индексами и без них.
+
+    На время замера без индексов они удаляются из базы и создаются
+    заново после него.
+    """
+    client = Client()
+    paths = {name: path for name, path in api_paths().items()
+             if name.startswith(('review', 'comments'))}
+    results = {name: measure(lambda path=path: client.get(path), repeat)
+               for name, path in paths.items()}
+    drop_indexes((Review, Comment))
+    try:
+        results.update({
+            f'{name}_no_index':
+                measure(lambda path=path: client.get(path), repeat)
+            for name, path in paths.items()
+        })
+    finally:
+        create_indexes((Review, Comment))
+    return results
+
+
+def search_scenario(repeat):
+    """Поиск произведений: подстрока в названии (`?name=`) и FTS5 (`?q=`).
+
+    Слова для поиска берутся из названия последнего произведения;
+    `rare` — слово, которого нет в каталоге: подстроку всё равно ищут
+    полным просмотром таблицы, FTS5 отвечает по индексу. `autocomplete` —
+    те же три буквы, что в `*_prefix`, из индекса в памяти; `texts_*` —
+    поиск по отзывам и комментариям (`/search/?q=`).
+    """
+    title = Title.objects.order_by('pk').last()
+    review = Review.objects.order_by('pk').last()
+    if title is None or review is None:
+        return {}
+    words = title.name.split()
+    queries = {
+        'word': words[0],
+        'words': ' '.join(words[:2]),
+        'prefix': words[-1][:3],
+        'rare': 'yamdbrareword',
+    }
+    client = Client()
+    results = {}
+    for name, query in queries.items():
+        for param in ('name', 'q'):
+            results[f'{param}_{name}'] = measure(
+                lambda param=param, query=query:
+                    client.get('/api/v1/titles/', {param: query}),
+                repeat,
+            )
+    results['autocomplete'] = measure(
+        lambda: client.get('/api/v1/titles/autocomplete/',
+                           {'prefix': words[0][:3]}),
+        repeat,
+    )
+    texts = {'word': review.text.split()[0], 'rare': 'yamdbrareword'}
+    for name, query in texts.items():
+        results[f'texts_{name}'] = measure(
+            lambda query=query: client.get('/api/v1/search/', {'q': query}),
+            repeat,
+        )
+    return results
+
+
+def misspell(name, rng):
+    """Название с одной опечаткой: пропуск, замена, перестановка букв."""
+    letters = [i for i, char in enumerate(name) if char.isalpha()]
+    if len(letters) < 2:
+        return name
+    i = rng.choice(letters[:-1])
+    kind = rng.choice(('drop', 'replace', 'swap'))
+    if kind == 'drop':
+        return name[:i] + name[i + 1:]
+    if kind == 'replace':
+        return name[:i] + rng.choice(name[letters[0]:]) + name[i + 1:]
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def words(name):
+    return tuple(sorted(name.casefold().split()))
+
+
+def fuzzy_scenario(repeat):
+    """Поиск названий с опечаткой: подстрока (`?name=`) и триграммы
+    (`?fuzzy=`).
+
+    Названия случайных произведений ищутся с одной опечаткой; полнота —
+    доля запросов, на первой странице которых есть произведение
+    с исходным названием. Синтетические названия собраны из небольшого
+    словаря, поэтому перестановка тех же слов считается исходным
+    названием: у неё те же триграммы и та же похожесть.
+    """
+    rng = random.Random(1)
+    last = Title.objects.order_by('pk').last()
+    if last is None:
+        return {}
+    ids = rng.sample(range(1, last.pk + 1), min(repeat, last.pk))
+    typos = [(name, misspell(name, rng)) for name in
+             Title.objects.filter(pk__in=ids).values_list('name', flat=True)]
+    client = Client()
+    results = {}
+    for param in ('name', 'fuzzy'):
+        queries = itertools.cycle(typos)
+        results[param] = measure(
+            lambda param=param, queries=queries:
+                client.get('/api/v1/titles/', {param: next(queries)[1]}),
+            repeat,
+        )
+        found = sum(
+            words(name) in {words(title['name']) for title in client.get(
+                '/api/v1/titles/', {param: typo}
+            ).json()['results']}
+            for name, typo in typos
+        )
+        results[param]['recall'] = round(found / len(typos), 3)
+    return results
+
+
+SCENARIOS = {
+    'api': api_scenario,
+    'sqlite': sqlite_scenario,
+    'indexes': indexes_scenario,
+    'search': search_scenario,
+    'fuzzy': fuzzy_scenario,
+}
+
+
+def run(scenarios, repeat):
+    """Запускает сценарии и возвращает результаты для сохранения."""
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'titles': Title.objects.count(),
+        'reviews': Review.objects.count(),
+        'results': {
+            scenario: SCENARIOS[scenario](repeat) for scenario in scenarios
+        },
+    }
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save(path, report):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def describe(result):
+    """Строка с метриками замера для вывода."""
+    parts = [f'p{p} {result[f"p{p}"]} мс' for p in PERCENTILES]
+    if 'queries' in result:
+        parts.append(f'запросов {result["queries"]}')
+    if 'recall' in result:
+        parts.append(f'полнота {result["recall"]}')
+    if 'reads_per_sec' in result:
+        parts.append(f'чтений {result["reads_per_sec"]}/с, '
+                     f'записей {result["writes_per_sec"]}/с, '
+                     f'ошибок {result["errors"]}')
+    return ', '.join(parts)
+
+
+def compare(previous, current):
+    """Строки сравнения p95 и числа запросов с предыдущим прогоном."""
+    lines = []
+    for scenario, results in current['results'].items():
+        old_results = previous['results'].get(scenario, {})
+        for name, result in results.items():
+            old = old_results.get(name)
+            if old is None:
+                continue
+            change = ((result['p95'] - old['p95']) / old['p95'] * 100
+                      if old['p95'] else 0.0)
+            line = (f'{scenario}.{name}: p95 {old["p95"]} -> '
+                    f'{result["p95"]} мс ({change:+.0f}%)')
+            for key, label in (('queries', 'запросов'),
+                               ('reads_per_sec', 'чтений/с'),
+                               ('recall', 'полнота')):
+                if key in result and key in old:
+                    line += f', {label} {old[key]} -> {result[key]}'
+            lines.append(line)
+    return lines
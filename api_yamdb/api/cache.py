@@ -0,0 +1,39 @@
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+VERSION_KEY = 'list-version:{label}'
+LIST_KEY = 'list:{label}:{version}:{host}:{query}'
+
+
+def new_version():
+    # счётчик, созданный заново после вытеснения из кэша,
+    # не должен совпасть с версией старых закэшированных ответов
+    return time.time_ns()
+
+
+def get_list_version(model):
+    key = VERSION_KEY.format(label=model._meta.label_lower)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_list_version(model):
+    key = VERSION_KEY.format(label=model._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), timeout=None)
+
+
+def list_cache_key(model, request):
+    return LIST_KEY.format(
+        label=model._meta.label_lower,
+        version=get_list_version(model),
+        host=request.get_host(),
+        query=urlencode(sorted(request.query_params.lists()), doseq=True),
+    )
@@ -1,19 +1,166 @@
+from datetime import datetime, time, timedelta
+
 import django_filters
+from django.conf import settings
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from reviews.models import Comment, GenreTitle, Review, Title, TitleTrigram
+from reviews.search import COMMENT_INDEX, REVIEW_INDEX, TITLE_INDEX
+from .serializers import HIT_COMMENT, HIT_REVIEW
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
 
-from reviews.models import Title
+
+class SlugInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    """Список slug через запятую: `?genre=drama,comedy`."""
 
 
 class TitleFilter(django_filters.FilterSet):
-    genre = django_filters.CharFilter(field_name='genre__slug',
-                                      method='filter_genre')
-    category = django_filters.CharFilter(field_name='category__slug')
+    genre = SlugInFilter(method='filter_genre')
+    category = SlugInFilter(field_name='category__slug', lookup_expr='in')
+    match = django_filters.ChoiceFilter(
+        choices=((MATCH_ANY, MATCH_ANY), (MATCH_ALL, MATCH_ALL)),
+        method='filter_match',
+    )
     name = django_filters.CharFilter(field_name='name',
                                      lookup_expr='icontains')
+    q = django_filters.CharFilter(method='filter_q')
+    fuzzy = django_filters.CharFilter(method='filter_fuzzy')
     year = django_filters.NumberFilter(field_name='year')
+    year_min = django_filters.NumberFilter(field_name='year',
+                                           lookup_expr='gte')
+    year_max = django_filters.NumberFilter(field_name='year',
+                                           lookup_expr='lte')
 
     def filter_genre(self, queryset, name, value):
-        return queryset.filter(genre__slug=value)
+        """Произведения с любым из жанров или, при `?match=all`, со всеми.
+
+        Связи отбираются подзапросом по GenreTitle, поэтому произведение
+        с несколькими подходящими жанрами не повторяется в выдаче.
+        """
+        slugs = set(filter(None, value))
+        if not slugs:
+            return queryset
+        links = GenreTitle.objects.filter(genre__slug__in=slugs)
+        if self.form.cleaned_data.get('match') == MATCH_ALL:
+            links = (links.values('title')
+                     .annotate(genres=Count('genre'))
+                     .filter(genres=len(slugs)))
+        return queryset.filter(pk__in=links.values('title'))
+
+    def filter_q(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию.
+
+        Слова ищутся по префиксу, результаты упорядочены по релевантности,
+        совпадение в названии весит больше. Без FTS5 — поиск подстроки.
+        """
+        if not TITLE_INDEX.available(queryset.db):
+            return queryset.filter(Q(name__icontains=value)
+                                   | Q(description__icontains=value))
+        return TITLE_INDEX.search(queryset, value)
+
+    def filter_fuzzy(self, queryset, name, value):
+        """Произведения с похожими названиями, самые похожие первыми.
+
+        Находит названия с опечатками и записанные латиницей; похожие
+        названия выбираются по индексу триграмм TitleTrigram.
+        """
+        found = [pk for pk, _ in TitleTrigram.objects.similar(
+            value, settings.FUZZY_LIMIT
+        )]
+        if not found:
+            return queryset.none()
+        return queryset.filter(pk__in=found).order_by(
+            Case(*(When(pk=pk, then=position)
+                   for position, pk in enumerate(found)),
+                 output_field=IntegerField())
+        )
+
+    def filter_match(self, queryset, name, value):
+        # учитывается в filter_genre
+        return queryset
 
     class Meta:
         model = Title
         fields = ('genre', 'category', 'name', 'year')
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class SearchHits:
+    """Найденные строки нескольких моделей в порядке релевантности.
+
+    Для пагинатора: срез — один запрос с UNION, а число строк считается
+    по каждой модели отдельно, без релевантности и сортировки — так
+    в разы быстрее COUNT по всему UNION.
+    """
+    ordered = True
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.hits = parts[0].union(*parts[1:], all=True).order_by(
+            'search_rank', 'hit_type', 'id'
+        )
+        self.db = self.hits.db
+
+    def count(self):
+        return sum(part.count() for part in self.parts)
+
+    def __getitem__(self, key):
+        return self.hits[key]
+
+
+def search_texts(q, type=None, title=None, author=None,
+                 date_from=None, date_to=None):
+    """Отзывы и комментарии, найденные по тексту, самые релевантные первыми.
+
+    Каждая модель ищется по своему индексу FTS5, результаты объединяются
+    одним UNION. Для отзыва `review_ref` пуст. Фрагменты текста
+    добавляет add_snippets после пагинации.
+    """
+    hits = []
+    if type != HIT_COMMENT:
+        hits.append(REVIEW_INDEX.search(
+            Review.objects.annotate(hit_type=Value(HIT_REVIEW),
+                                    title_ref=F('title_id'),
+                                    review_ref=Value(None, IntegerField())),
+            q,
+        ))
+    if type != HIT_REVIEW:
+        hits.append(COMMENT_INDEX.search(
+            Comment.objects.annotate(hit_type=Value(HIT_COMMENT),
+                                     title_ref=F('review__title_id'),
+                                     review_ref=F('review_id')),
+            q,
+        ))
+    scope = {}
+    if title is not None:
+        scope['title_ref'] = title
+    if author is not None:
+        scope['author__username'] = author
+    if date_from is not None:
+        scope['pub_date__gte'] = day_start(date_from)
+    if date_to is not None:
+        scope['pub_date__lt'] = day_start(date_to + timedelta(days=1))
+    return SearchHits([
+        queryset.filter(**scope)
+        .values('search_rank', 'hit_type', 'id', 'title_ref', 'review_ref',
+                'author__username', 'pub_date')
+        .order_by()
+        for queryset in hits
+    ])
+
+
+def add_snippets(hits, q, using):
+    """Добавляет найденным отзывам и комментариям фрагменты текста."""
+    for hit_type, index in ((HIT_REVIEW, REVIEW_INDEX),
+                            (HIT_COMMENT, COMMENT_INDEX)):
+        ids = [hit['id'] for hit in hits if hit['hit_type'] == hit_type]
+        snippets = index.snippets(ids, q, using)
+        for hit in hits:
+            if hit['hit_type'] == hit_type:
+                hit['snippet'] = snippets.get(hit['id'], '')
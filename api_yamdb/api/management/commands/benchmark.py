@@ -0,0 +1,65 @@
+import datetime
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет p50/p95/p99 задержки и число SQL-запросов эндпоинтов '
+            'API на текущих данных и сравнивает с предыдущим прогоном.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=benchmark.SCENARIOS,
+            help='сценарий замеров, можно указать несколько '
+                 '(по умолчанию все)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='число запросов на каждый замер',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=os.path.join(settings.BASE_DIR, 'benchmarks'),
+            help='каталог для json-файлов с результатами',
+        )
+        parser.add_argument(
+            '--compare',
+            help=('json-файл прошлого прогона для сравнения, по умолчанию '
+                  'последний файл из --output-dir'),
+        )
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        previous = options['compare'] or self.latest(output_dir)
+        report = benchmark.run(options['scenario'] or benchmark.SCENARIOS,
+                               options['repeat'])
+        for scenario, results in report['results'].items():
+            for name, result in results.items():
+                self.stdout.write(
+                    f'{scenario}.{name}: {benchmark.describe(result)}'
+                )
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(
+            output_dir,
+            f'benchmark-{datetime.datetime.now():%Y%m%d-%H%M%S-%f}.json',
+        )
+        benchmark.save(path, report)
+        self.stdout.write(f'Результаты сохранены в {path}')
+        if previous:
+            self.stdout.write(f'Сравнение с {previous}:')
+            for line in benchmark.compare(benchmark.load(previous), report):
+                self.stdout.write(line)
+
+    @staticmethod
+    def latest(output_dir):
+        paths = sorted(glob.glob(os.path.join(output_dir, 'benchmark-*.json')))
+        return paths[-1] if paths else None
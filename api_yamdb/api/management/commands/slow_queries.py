@@ -0,0 +1,60 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.slow_queries import aggregate, read_log
+
+
+class Command(BaseCommand):
+    help = ('Выводит сводку журнала медленных SQL-запросов по отпечаткам: '
+            'число, суммарное и максимальное время, представления и план.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=settings.SLOW_QUERY_LOG,
+            help='журнал медленных запросов (jsonl)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='сколько самых затратных запросов показать',
+        )
+        parser.add_argument(
+            '--view',
+            help='только запросы из представления, чьё имя содержит строку',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='очистить журнал после вывода',
+        )
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not path or not os.path.exists(path):
+            raise CommandError(f'Журнал медленных запросов не найден: {path}')
+        entries = read_log(path)
+        if options['view']:
+            entries = (entry for entry in entries
+                       if options['view'] in (entry['view'] or ''))
+        items = aggregate(entries)
+        for item in items[:options['limit']]:
+            self.stdout.write(self.style.SQL_KEYWORD(
+                f'{item["count"]} раз, всего {item["total_ms"]:.1f} мс, '
+                f'максимум {item["max_ms"]:.1f} мс'
+            ))
+            self.stdout.write(f'  {item["fingerprint"]}')
+            if item['views']:
+                self.stdout.write(
+                    f'  представления: {", ".join(sorted(item["views"]))}'
+                )
+            self.stdout.write(f'  параметры: {item["params"]}')
+            for row in item['plan'] or ():
+                self.stdout.write(f'  план: {row}')
+        if not items:
+            self.stdout.write('Медленных запросов нет')
+        if options['clear']:
+            os.remove(path)
@@ -0,0 +1,203 @@
+import cProfile
+import logging
+import os
+import re
+import time
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api_yamdb.routers import read_from_replica
+
+from .permissions import IsAdmin
+from .slow_queries import log_slow_queries
+
+logger = logging.getLogger('api.sql')
+
+Query = namedtuple('Query', 'alias sql params many duration')
+
+
+class QueryCollector:
+    """Обёртка execute_wrapper: считает запросы и время в базе."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            self.queries.append(Query(context['connection'].alias, sql,
+                                      params, many, duration))
+
+
+@contextmanager
+def collect_queries(collector):
+    """Подключает collector ко всем соединениям с базами."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(collector))
+        yield collector
+
+
+class QueryCountMiddleware:
+    """Считает SQL-запросы запроса и время, проведённое в базе.
+
+    Результат отдаётся в заголовках Server-Timing и X-DB-Queries,
+    запросы сверх бюджета пишутся в лог вместе со своим SQL,
+    медленные SQL-запросы — в журнал SLOW_QUERY_LOG.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with collect_queries(QueryCollector()) as collector:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = collector.duration * 1000
+        response['X-DB-Queries'] = collector.count
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{collector.count} queries", '
+            f'total;dur={total_ms:.1f}'
+        )
+        if (collector.count > settings.REQUEST_QUERY_BUDGET
+                or total_ms > settings.REQUEST_TIME_BUDGET_MS):
+            self.log_over_budget(request, collector, db_ms, total_ms)
+        log_slow_queries(request, collector.queries)
+        return response
+
+    def log_over_budget(self, request, collector, db_ms, total_ms):
+        queries = '\n'.join(
+            f'  {query.duration * 1000:.1f} ms: {query.sql}'
+            for query in collector.queries
+        )
+        logger.warning(
+            '%s %s: %d запросов, %.1f мс в базе, %.1f мс всего\n%s',
+            request.method, request.get_full_path(), collector.count,
+            db_ms, total_ms, queries,
+        )
+
+
+class ProfileMiddleware:
+    """Профилирует запрос администратора с заголовком X-Profile.
+
+    Дамп cProfile и журнал SQL сохраняются в PROFILE_DIR, имя дампа
+    возвращается в заголовке ответа X-Profile. Хранятся только
+    последние PROFILE_RETENTION дампов.
+    """
+    header = 'HTTP_X_PROFILE'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.META.get(self.header) or not self.is_admin(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        with collect_queries(QueryCollector()) as collector:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        response['X-Profile'] = self.save(request, profiler, collector)
+        return response
+
+    @staticmethod
+    def is_admin(request):
+        drf_request = Request(request, authenticators=[
+            authentication()
+            for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ])
+        try:
+            return bool(IsAdmin().has_permission(drf_request, None))
+        except APIException:
+            return False
+
+    def save(self, request, profiler, collector):
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = re.sub(r'[^\w-]+', '_', request.path).strip('_')
+        name = (f'{timezone.now():%Y%m%d-%H%M%S-%f}-'
+                f'{request.method.lower()}-{path}')
+        base = os.path.join(settings.PROFILE_DIR, name)
+        profiler.dump_stats(f'{base}.prof')
+        with open(f'{base}.sql', 'w', encoding='utf-8') as file:
+            file.write(f'{request.method} {request.get_full_path()}: '
+                       f'{collector.count} запросов, '
+                       f'{collector.duration * 1000:.1f} мс\n')
+            for query in collector.queries:
+                file.write(f'{query.duration * 1000:.1f} ms: {query.sql}\n')
+        self.remove_old()
+        return f'{name}.prof'
+
+    @staticmethod
+    def remove_old():
+        dumps = sorted(name for name in os.listdir(settings.PROFILE_DIR)
+                       if name.endswith('.prof'))
+        keep = max(settings.PROFILE_RETENTION, 1)
+        for name in dumps[:max(len(dumps) - keep, 0)]:
+            base = os.path.join(settings.PROFILE_DIR, name[:-len('.prof')])
+            for suffix in ('.prof', '.sql'):
+                if os.path.exists(base + suffix):
+                    os.remove(base + suffix)
+
+
+class ReplicaMiddleware:
+    """Отправляет безопасные запросы к API на реплики.
+
+    После записи пользователь REPLICA_STICKY_SECONDS секунд читает
+    из основной базы и сразу видит свои изменения, даже если реплика
+    ещё не догнала основную базу.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+    sticky_key = 'replica-sticky:{}'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS or not request.path.startswith(
+                '/api/'):
+            return self.get_response(request)
+        user_id = self.user_id(request)
+        if request.method not in self.safe_methods:
+            response = self.get_response(request)
+            if user_id is not None and response.status_code < 400:
+                cache.set(self.sticky_key.format(user_id), True,
+                          settings.REPLICA_STICKY_SECONDS)
+            return response
+        if (user_id is not None
+                and cache.get(self.sticky_key.format(user_id))):
+            return self.get_response(request)
+        with read_from_replica():
+            return self.get_response(request)
+
+    @staticmethod
+    def user_id(request):
+        """Id пользователя из JWT без запроса к базе."""
+        header = request.META.get(jwt_settings.AUTH_HEADER_NAME, '').split()
+        if (len(header) != 2
+                or header[0] not in jwt_settings.AUTH_HEADER_TYPES):
+            return None
+        try:
+            return AccessToken(header[1])[jwt_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError):
+            return None
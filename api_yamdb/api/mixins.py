@@ -1,8 +1,17 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import mixins, viewsets
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+from rest_framework.response import Response
 
 
+from .cache import list_cache_key
 from .permissions import IsAdminOrReadOnly
 
 
@@ -14,7 +23,75 @@ class CreateDestroyListViewSet(mixins.CreateModelMixin,
     pass
 
 
-class CategoryGenreViewSet(CreateDestroyListViewSet):
+class CachedListMixin:
+    """Кэширует ответы list, ключ содержит версию данных модели.
+
+    При промахе список читается из основной базы: отставшая реплика
+    попала бы в кэш под уже новой версией.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset.using(router.db_for_write(queryset.model))
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(self.queryset.model, request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data, settings.LIST_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 Not Modified на условные GET-запросы.
+
+    ETag считается по id и полю `modified` уже выбранных объектов,
+    так что при совпадении сериализатор не запускается вовсе.
+    """
+
+    def not_modified(self, request, etag, last_modified=None):
+        return get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+
+    def object_label(self):
+        return self.get_serializer_class().Meta.model._meta.model_name
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = quote_etag(f'{self.object_label()}-{instance.pk}-'
+                          f'{instance.modified.timestamp()}')
+        last_modified = int(instance.modified.timestamp())
+        response = self.not_modified(request, etag, last_modified)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        objects = list(queryset) if page is None else page
+        state = [(obj.pk, obj.modified.timestamp()) for obj in objects]
+        if page is not None:
+            # count и ссылки next/previous тоже входят в ответ
+            state.append(self.get_paginated_response([]).data)
+        digest = hashlib.md5(
+            f'{request.get_full_path()}-{state}'.encode()
+        ).hexdigest()
+        etag = quote_etag(f'{self.object_label()}-list-{digest}')
+        response = self.not_modified(request, etag)
+        if response is None:
+            data = self.get_serializer(objects, many=True).data
+            response = (Response(data) if page is None
+                        else self.get_paginated_response(data))
+        response['ETag'] = etag
+        return response
+
+
+class CategoryGenreViewSet(CachedListMixin, CreateDestroyListViewSet):
     lookup_field = 'slug'
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
@@ -0,0 +1,63 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+PAGINATION_QUERY_PARAM = 'pagination'
+CURSOR_PAGINATION = 'cursor'
+
+
+class KeysetPagination(CursorPagination):
+    """Курсорная пагинация по индексированным полям: без COUNT и OFFSET."""
+    ordering = ('pub_date', 'id')
+
+
+class TitleKeysetPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """Постраничная пагинация с курсорным режимом по запросу.
+
+    Курсорный режим включается параметром `?pagination=cursor`,
+    ссылки next/previous в нём содержат непрозрачный `cursor`.
+    С параметрами ranked_params, упорядочивающими выдачу по-своему,
+    курсорный режим отклоняется: курсор потерял бы этот порядок.
+    """
+    keyset_class = KeysetPagination
+    keyset = None
+    ranked_params = ()
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(PAGINATION_QUERY_PARAM)
+            == CURSOR_PAGINATION
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            ranked = [param for param in self.ranked_params
+                      if param in request.query_params]
+            if ranked:
+                raise ValidationError({PAGINATION_QUERY_PARAM: [
+                    'Курсорная пагинация несовместима с параметрами '
+                    f'{", ".join(ranked)}: их выдача упорядочена '
+                    'по релевантности.'
+                ]})
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.keyset is not None:
+            return self.keyset.to_html()
+        return super().to_html()
+
+
+class TitlePagination(OptionalKeysetPagination):
+    keyset_class = TitleKeysetPagination
+    ranked_params = ('q', 'fuzzy')
@@ -1,4 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from rest_framework.validators import UniqueTogetherValidator
 from django.shortcuts import get_object_or_404
 
@@ -8,6 +10,9 @@ from reviews.models import (Category, Comment, Genre,
 from reviews.validators import validate_year
 
 PATTERN_USER = r'^[\w.@+-]+\Z'
+EXPAND_PARAM = 'expand'
+HIT_REVIEW = 'review'
+HIT_COMMENT = 'comment'
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -32,11 +37,42 @@ class GenreSerializer(serializers.ModelSerializer):
         fields = ('name', 'slug',)
 
 
+class SlugListField(serializers.ManyRelatedField):
+    """Список слагов, объекты для которого ищутся одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        slugs = [str(slug) for slug in data]
+        found = {
+            str(getattr(obj, child.slug_field)): obj
+            for obj in child.get_queryset().filter(
+                **{f'{child.slug_field}__in': slugs}
+            )
+        }
+        for slug in slugs:
+            if slug not in found:
+                child.fail('does_not_exist', slug_name=child.slug_field,
+                           value=slug)
+        return [found[slug] for slug in slugs]
+
+
 class GenreTitle(serializers.SlugRelatedField):
     def to_representation(self, value):
         serializer = GenreSerializer(value)
         return serializer.data
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return SlugListField(**list_kwargs)
+
 
 class TitleSerializer(serializers.ModelSerializer):
     category = CategoryTitle(slug_field='slug',
@@ -46,17 +82,66 @@ class TitleSerializer(serializers.ModelSerializer):
                        queryset=Genre.objects.all(),
                        many=True)
     rating = serializers.IntegerField(read_only=True)
+    score_histogram = serializers.DictField(
+        child=serializers.IntegerField(), read_only=True
+    )
+    median_score = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Title
         fields = ('name', 'category',
                   'genre', 'description',
-                  'rating', 'id', 'year')
+                  'rating', 'id', 'year',
+                  'score_histogram', 'median_score')
+        # выводятся только по запросу ?expand=score_histogram
+        expandable_fields = {
+            'score_histogram': ('score_histogram', 'median_score'),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        expand = set(request.query_params.get(EXPAND_PARAM, '').split(',')
+                     if request is not None else ())
+        for name, fields in self.Meta.expandable_fields.items():
+            if name not in expand:
+                for field in fields:
+                    self.fields.pop(field)
 
     def validate_year(self, year):
         return validate_year(year)
 
 
+class TopTitlesSerializer(serializers.Serializer):
+    """Параметры запроса топа произведений."""
+    category = serializers.SlugRelatedField(slug_field='slug',
+                                            queryset=Category.objects.all(),
+                                            required=False)
+    genre = serializers.SlugRelatedField(slug_field='slug',
+                                         queryset=Genre.objects.all(),
+                                         required=False)
+    limit = serializers.IntegerField(min_value=1,
+                                     max_value=settings.LEADERBOARD_MAX_LIMIT,
+                                     default=settings.LEADERBOARD_LIMIT)
+
+    def validate(self, data):
+        if 'category' in data and 'genre' in data:
+            raise serializers.ValidationError(
+                'Укажите либо категорию, либо жанр.'
+            )
+        return data
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Параметры автодополнения названий произведений."""
+    prefix = serializers.CharField()
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.AUTOCOMPLETE_MAX_LIMIT,
+        default=settings.AUTOCOMPLETE_LIMIT,
+    )
+
+
 class UserForAdminSerializer(serializers.ModelSerializer):
     """Сериализатор для User"""
     class Meta:
@@ -140,3 +225,33 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ('id', 'text', 'author', 'pub_date')
         read_only_fields = ('author', 'review', 'pub_date')
+
+
+class TextSearchSerializer(serializers.Serializer):
+    """Параметры поиска по текстам отзывов и комментариев."""
+    q = serializers.CharField()
+    type = serializers.ChoiceField(choices=(HIT_REVIEW, HIT_COMMENT),
+                                   required=False)
+    title = serializers.IntegerField(min_value=1, required=False)
+    author = serializers.CharField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and (
+                data['date_from'] > data['date_to']):
+            raise serializers.ValidationError(
+                'Начало периода позже его конца.'
+            )
+        return data
+
+
+class TextSearchHitSerializer(serializers.Serializer):
+    """Найденный отзыв или комментарий с фрагментом текста."""
+    type = serializers.CharField(source='hit_type')
+    id = serializers.IntegerField()
+    title = serializers.IntegerField(source='title_ref')
+    review = serializers.IntegerField(source='review_ref', allow_null=True)
+    author = serializers.CharField(source='author__username')
+    pub_date = serializers.DateTimeField()
+    snippet = serializers.CharField()
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from reviews.models import Category, Genre, Title
+from reviews.signals import bulk_changed, changed_titles
+
+from .autocomplete import TITLE_NAMES
+from .cache import bump_list_version
+
+
+@receiver((post_save, post_delete, bulk_changed), sender=Category)
+@receiver((post_save, post_delete, bulk_changed), sender=Genre)
+def invalidate_list_cache(sender, **kwargs):
+    bump_list_version(sender)
+
+
+@receiver(post_save, sender=Title)
+def index_title_name(sender, instance, using, **kwargs):
+    # после отката транзакции индекс не должен видеть изменение
+    pk, name = instance.pk, instance.name
+    transaction.on_commit(lambda: TITLE_NAMES.changed(pk, name), using=using)
+
+
+@receiver(post_delete, sender=Title)
+def unindex_title_name(sender, instance, using, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: TITLE_NAMES.changed(pk, None), using=using)
+
+
+@receiver(bulk_changed, sender=Title)
+def reset_title_names(sender, title_ids=None, **kwargs):
+    # импорт рассылает сигнал в транзакции пачки: до фиксации другие
+    # процессы перечитали бы индекс без её изменений
+    using = router.db_for_write(Title)
+    # немногие изменения проходят через журнал, как обычное сохранение
+    if title_ids is None or (
+        len(title_ids) > settings.AUTOCOMPLETE_BULK_JOURNAL_SIZE
+    ):
+        transaction.on_commit(TITLE_NAMES.reset, using=using)
+        return
+    names = {}
+    for titles in changed_titles(title_ids):
+        names.update(titles.values_list('pk', 'name'))
+    for pk in title_ids:
+        transaction.on_commit(
+            lambda pk=pk: TITLE_NAMES.changed(pk, names.get(pk)), using=using
+        )
@@ -0,0 +1,103 @@
+"""Журнал медленных SQL-запросов с планами выполнения."""
+import json
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+}
+PLACEHOLDERS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL без значений: запросы, отличающиеся параметрами, совпадают."""
+    sql = LITERALS.sub('%s', sql)
+    sql = PLACEHOLDERS.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def explain(alias, sql, params):
+    """План выполнения SELECT-запроса или None, если его не получить."""
+    connection = connections[alias]
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if prefix is None or not sql.lstrip().upper().startswith(
+            ('SELECT', 'WITH')):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [' '.join(str(value) for value in row)
+                    for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def view_name(request):
+    match = request.resolver_match
+    if match is None:
+        return None
+    view = getattr(match.func, 'cls', match.func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+def log_slow_queries(request, queries):
+    """Дописывает в SLOW_QUERY_LOG запросы дольше SLOW_QUERY_MS.
+
+    Вызывается после обработки запроса, когда подсчёт запросов уже
+    отключён, поэтому сами EXPLAIN в статистику не попадают.
+    """
+    slow = [query for query in queries
+            if query.duration * 1000 >= settings.SLOW_QUERY_MS]
+    if not slow or not settings.SLOW_QUERY_LOG:
+        return
+    view = view_name(request)
+    with open(settings.SLOW_QUERY_LOG, 'a', encoding='utf-8') as file:
+        for query in slow:
+            entry = {
+                'time': timezone.now().isoformat(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': view,
+                'duration_ms': round(query.duration * 1000, 3),
+                'fingerprint': fingerprint(query.sql),
+                'sql': query.sql,
+                'params': None if query.many else query.params,
+                'plan': (None if query.many
+                         else explain(query.alias, query.sql, query.params)),
+            }
+            file.write(json.dumps(entry, ensure_ascii=False, default=str))
+            file.write('\n')
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def aggregate(entries):
+    """Сводка по отпечаткам запросов, самые затратные первыми."""
+    stats = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                 'views': set()})
+    for entry in entries:
+        item = stats[entry['fingerprint']]
+        item['count'] += 1
+        item['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= item['max_ms']:
+            item.update(max_ms=entry['duration_ms'], sql=entry['sql'],
+                        params=entry['params'], plan=entry['plan'])
+        if entry['view']:
+            item['views'].add(entry['view'])
+    return sorted(
+        ({'fingerprint': key, **item} for key, item in stats.items()),
+        key=lambda item: item['total_ms'], reverse=True,
+    )
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (CategoryViewSet, GenreViewSet,
                     TitleViewSet, UserViewSet, ReviewViewSet, CommentViewSet,
-                    get_token, sign_up)
+                    TextSearchViewSet, get_token, sign_up)
 
 
 router_v1 = DefaultRouter()
@@ -12,6 +12,7 @@ router_v1.register('categories', CategoryViewSet, basename='categories')
 router_v1.register('genres', GenreViewSet, basename='genres')
 router_v1.register('titles', TitleViewSet, basename='titles')
 router_v1.register(r'users', UserViewSet, basename='user')
+router_v1.register('search', TextSearchViewSet, basename='search')
 router_v1.register(
     r'titles/(?P<title_id>[\d]+)/reviews',
     ReviewViewSet,
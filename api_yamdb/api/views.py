@@ -1,5 +1,5 @@
 from django.core.mail import send_mail
-from django.db.models import Avg
+from django.db.models import prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
@@ -10,16 +10,21 @@ from rest_framework_simplejwt.tokens import AccessToken
 
 from uuid import uuid4
 
-from .filters import TitleFilter
+from .autocomplete import TITLE_NAMES
+from .filters import TitleFilter, add_snippets, search_texts
+from .pagination import OptionalKeysetPagination, TitlePagination
 from .permissions import (IsAdmin, IsAdminOrReadOnly,
                           IsAuthorOrReadOnly)
-from reviews.models import Category, Genre, Title, User, Review
-from .serializers import (CategorySerializer, GenreSerializer,
-                          TitleSerializer,
+from reviews.models import (Category, Genre, LeaderboardEntry, Title, User,
+                            Review)
+from .serializers import (AutocompleteSerializer, CategorySerializer,
+                          GenreSerializer, TitleSerializer,
+                          TopTitlesSerializer,
                           UserForAdminSerializer, UserForUserSerializer,
                           ReviewSerializer, CommentSerializer,
-                          GetTokenSerializer)
-from .mixins import CategoryGenreViewSet
+                          GetTokenSerializer, TextSearchHitSerializer,
+                          TextSearchSerializer)
+from .mixins import CategoryGenreViewSet, ConditionalGetMixin
 
 DEFAULT_EMAIL_SUBJECT = 'Подтверждение регистрации пользователя'
 DEFAULT_FROM_EMAIL = 'message@yamdb.com'
@@ -35,14 +40,45 @@ class CategoryViewSet(CategoryGenreViewSet):
     serializer_class = CategorySerializer
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = (Title.objects.all()
-                .annotate(rating=Avg('reviews__score')))
+class TitleViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = (Title.objects
+                .select_related('category')
+                .prefetch_related('genre'))
     permission_classes = [IsAdminOrReadOnly]
     serializer_class = TitleSerializer
     filterset_class = TitleFilter
     filter_backends = (DjangoFilterBackend,)
     ordering_fields = ['name']
+    pagination_class = TitlePagination
+
+    @action(methods=('get',), detail=False)
+    def top(self, request):
+        """Лучшие по средней оценке произведения: все, категории или жанра.
+
+        Читается готовый топ из LeaderboardEntry диапазоном индекса.
+        """
+        params = TopTitlesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        entries = (LeaderboardEntry.objects
+                   .top(params.validated_data.get('category'),
+                        params.validated_data.get('genre'))
+                   .select_related('title__category')
+                   [:params.validated_data['limit']])
+        titles = [entry.title for entry in entries]
+        prefetch_related_objects(titles, 'genre')
+        return Response(self.get_serializer(titles, many=True).data)
+
+    @action(methods=('get',), detail=False)
+    def autocomplete(self, request):
+        """Произведения, названия которых начинаются с prefix: id и название.
+
+        Отвечает индекс в памяти процесса, без запросов к базе.
+        """
+        params = AutocompleteSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        found = TITLE_NAMES.lookup(params.validated_data['prefix'],
+                                   params.validated_data['limit'])
+        return Response([{'id': pk, 'name': name} for pk, name in found])
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -108,9 +144,10 @@ def get_token(request):
                     status=status.HTTP_200_OK)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthorOrReadOnly,)
+    pagination_class = OptionalKeysetPagination
 
     @property
     def __title(self):
@@ -120,7 +157,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
         )
 
     def get_queryset(self):
-        return self.__title.reviews.all()
+        return self.__title.reviews.select_related('author')
 
     def perform_create(self, serializer):
         serializer.save(
@@ -129,9 +166,10 @@ class ReviewViewSet(viewsets.ModelViewSet):
         )
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = (IsAuthorOrReadOnly,)
+    pagination_class = OptionalKeysetPagination
 
     @property
     def __review(self):
@@ -141,10 +179,27 @@ class CommentViewSet(viewsets.ModelViewSet):
         )
 
     def get_queryset(self):
-        return self.__review.comments.all()
+        return self.__review.comments.select_related('author')
 
     def perform_create(self, serializer):
         serializer.save(
             author=self.request.user,
             review=self.__review
         )
+
+
+class TextSearchViewSet(viewsets.GenericViewSet):
+    """Полнотекстовый поиск по отзывам и комментариям."""
+    serializer_class = TextSearchHitSerializer
+
+    def get_queryset(self):
+        self.params = TextSearchSerializer(data=self.request.query_params)
+        self.params.is_valid(raise_exception=True)
+        return search_texts(**self.params.validated_data)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        add_snippets(page, self.params.validated_data['q'], queryset.db)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,50 @@
+"""Настройка соединений с SQLite."""
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+
+LOCKED_MESSAGE = 'database is locked'
+
+
+def retry_locked(execute, sql, params, many, context):
+    """Повторяет запрос, если база занята другим процессом.
+
+    Внутри транзакции не повторяет: SQLite мог уже откатить её,
+    решать должен вызывающий код.
+    """
+    connection = context['connection']
+    delay = settings.SQLITE_RETRY_DELAY
+    for attempt in range(settings.SQLITE_RETRIES + 1):
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            if (LOCKED_MESSAGE not in str(error)
+                    or connection.in_atomic_block
+                    or attempt == settings.SQLITE_RETRIES):
+                raise
+        time.sleep(delay * 2 ** attempt)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Выставляет SQLITE_PRAGMAS на каждом новом соединении с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    # напрямую через sqlite3, чтобы PRAGMA не попадали в счётчики запросов
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+    # в начало списка: execute_wrapper() снимает обёртки с конца
+    if retry_locked not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, retry_locked)
+
+
+def replicate(source, target):
+    """Копирует базу SQLite source в target через backup API.
+
+    Копия согласована: читатели target видят либо прежнее, либо новое
+    состояние целиком. Заменяет настоящую репликацию при локальной
+    проверке работы с репликами.
+    """
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
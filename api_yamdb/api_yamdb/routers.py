@@ -0,0 +1,44 @@
+"""Маршрутизация запросов между основной базой и репликами."""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# включается middleware на время безопасных запросов к API
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def read_from_replica():
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Пишет в основную базу, читает из реплик, когда это разрешено.
+
+    Из реплики читаются только модели из REPLICA_MODELS: пользователи
+    и служебные таблицы всегда читаются из основной базы, чтобы только
+    что зарегистрированный пользователь мог сразу войти.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (settings.DATABASE_REPLICAS and replica_reads.get()
+                and model._meta.label in settings.REPLICA_MODELS):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # в репликах те же данные, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -33,6 +33,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryCountMiddleware',
+    'api.middleware.ProfileMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,9 +73,92 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            # секунды ожидания блокировки записи другим соединением
+            'timeout': float(os.getenv('SQLITE_TIMEOUT', 5)),
+        },
+    }
+}
+
+# реплики для чтения: пути к файлам SQLite через запятую, см.
+# api_yamdb/routers.py и команду replicate
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['api_yamdb.routers.PrimaryReplicaRouter']
+REPLICA_MODELS = (
+    'reviews.Category', 'reviews.Genre', 'reviews.Title', 'reviews.GenreTitle',
+    'reviews.Review', 'reviews.Comment', 'reviews.LeaderboardEntry',
+    'reviews.TitleTrigram',
+)
+# сколько секунд после записи пользователь читает из основной базы
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+# выставляются на каждом новом соединении, см. api_yamdb/db.py
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # отрицательное значение — размер в КиБ
+    'cache_size': -int(os.getenv('SQLITE_CACHE_KB', 64 * 1024)),
+    'temp_store': 'MEMORY',
+}
+# повторы запроса вне транзакции при «database is locked»
+SQLITE_RETRIES = int(os.getenv('SQLITE_RETRIES', 3))
+SQLITE_RETRY_DELAY = float(os.getenv('SQLITE_RETRY_DELAY', 0.05))
+
+
+# Cache
+# Кэш общий для всех процессов gunicorn: версии списков, журнал
+# автодополнения и привязка чтений к основной базе должны быть видны
+# каждому процессу. Для многих процессов лучше memcached, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache
+# CACHE_LOCATION=127.0.0.1:11211
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        'OPTIONS': {
+            # журнал автодополнения хранит до AUTOCOMPLETE_JOURNAL_SIZE
+            # изменений, файловый кэш по умолчанию — только 300 записей
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 5000)),
+        },
     }
 }
 
+LIST_CACHE_TIMEOUT = 60 * 60
+
+# в топы titles/top/ попадают произведения хотя бы с таким числом оценок
+LEADERBOARD_MIN_REVIEWS = int(os.getenv('LEADERBOARD_MIN_REVIEWS', 3))
+LEADERBOARD_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 100
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+# сколько изменений названий процесс догоняет по журналу, а не
+# перестраивает индекс автодополнения целиком
+AUTOCOMPLETE_JOURNAL_SIZE = 1000
+# сколько названий из одной пачки массовой записи идёт через журнал;
+# при большем числе индекс строится заново
+AUTOCOMPLETE_BULK_JOURNAL_SIZE = 100
+
+# нечёткий поиск ?fuzzy=: сколько кандидатов с общими триграммами
+# выбирать из базы, минимальное сходство и число найденных произведений
+FUZZY_CANDIDATES = 200
+FUZZY_THRESHOLD = float(os.getenv('FUZZY_THRESHOLD', 0.3))
+FUZZY_LIMIT = 50
+
 
 # Password validation
 
@@ -158,3 +244,33 @@ AUTH_USER_MODEL = 'reviews.User'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# Бюджет запроса: при превышении запрос и его SQL пишутся в лог api.sql
+
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', 30))
+REQUEST_TIME_BUDGET_MS = int(os.getenv('REQUEST_TIME_BUDGET_MS', 500))
+
+# журнал SQL-запросов дольше SLOW_QUERY_MS, пустой путь отключает журнал
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG',
+                           os.path.join(BASE_DIR, 'slow_queries.jsonl'))
+
+# профилирование запросов администраторов с заголовком X-Profile
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_RETENTION = int(os.getenv('PROFILE_RETENTION', 50))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
@@ -19,8 +19,18 @@ class UserAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class GenreTitleInline(admin.TabularInline):
+    # жанры связаны через GenreTitle, в форме произведения их нет
+    model = GenreTitle
+    extra = 1
+
+
+class TitleAdmin(admin.ModelAdmin):
+    inlines = (GenreTitleInline,)
+
+
 admin.site.register(User, UserAdmin)
-admin.site.register(Title)
+admin.site.register(Title, TitleAdmin)
 admin.site.register(Category)
 admin.site.register(Genre)
 admin.site.register(GenreTitle)
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from api_yamdb.db import configure_sqlite
+        from . import signals  # noqa: F401
+        from .search import restore_triggers
+
+        connection_created.connect(configure_sqlite)
+        post_migrate.connect(restore_triggers, sender=self)
@@ -0,0 +1,175 @@
+"""Генерация синтетических данных для нагрузочных тестов."""
+import datetime
+import random
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .importer import chunked, keep_auto_now_add
+from .models import Category, Comment, Genre, GenreTitle, Review, Title, User
+from .signals import bulk_changed
+
+DEFAULT_BATCH_SIZE = 5000
+WORDS = (
+    'тёмный', 'свет', 'город', 'ночь', 'дорога', 'море', 'последний',
+    'тайна', 'звезда', 'война', 'мир', 'красный', 'белый', 'ветер',
+    'остров', 'король', 'сердце', 'зима', 'лето', 'огонь', 'тень',
+    'дом', 'старый', 'новый', 'песня', 'время', 'река', 'небо',
+    'shadow', 'night', 'river', 'king', 'star', 'road', 'winter',
+)
+PERIOD = datetime.timedelta(days=5 * 365)
+YEARS = (1900, 2020)
+
+
+class Generator:
+    """Создаёт связанные данные заданного объёма через bulk_create.
+
+    Распределения неравномерные: число отзывов на произведение убывает
+    по закону Ципфа с показателем `skew`, комментарии чаще достаются
+    отзывам популярных произведений. Id назначаются явно, начиная
+    после существующих, поэтому внешние ключи не требуют запросов.
+    """
+
+    def __init__(self, users, categories, genres, titles, reviews, comments,
+                 max_genres=3, skew=1.1, batch_size=DEFAULT_BATCH_SIZE,
+                 seed=None):
+        self.counts = {User: users, Category: categories, Genre: genres,
+                       Title: titles, Review: reviews, Comment: comments}
+        self.max_genres = max_genres
+        self.skew = skew
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+        self.first_ids = {}
+        self.created = {}
+
+    def first_id(self, model):
+        if model not in self.first_ids:
+            last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            self.first_ids[model] = last + 1
+        return self.first_ids[model]
+
+    def ids(self, model):
+        first = self.first_id(model)
+        return range(first, first + self.created.get(model, 0))
+
+    def text(self, words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def date(self):
+        return self.now - PERIOD * self.random.random()
+
+    def write(self, model, objs):
+        count = 0
+        for chunk in chunked(objs, self.batch_size):
+            with transaction.atomic(), keep_auto_now_add(model):
+                model.objects.bulk_create(chunk)
+            count += len(chunk)
+        self.created[model] = count
+        if model is GenreTitle:
+            # связи получают только новые произведения, id связей — из базы
+            bulk_changed.send(sender=model, title_ids=self.ids(Title))
+        else:
+            bulk_changed.send(sender=model, pks=self.ids(model))
+        return count
+
+    def users(self):
+        for pk in range(self.first_id(User),
+                        self.first_id(User) + self.counts[User]):
+            yield User(id=pk, username=f'user{pk}',
+                       email=f'user{pk}@yamdb.fake')
+
+    def slugged(self, model, prefix):
+        for pk in range(self.first_id(model),
+                        self.first_id(model) + self.counts[model]):
+            yield model(id=pk, name=f'{self.text(1).capitalize()} {pk}',
+                        slug=f'{prefix}-{pk}')
+
+    def titles(self):
+        categories = self.ids(Category)
+        for pk in range(self.first_id(Title),
+                        self.first_id(Title) + self.counts[Title]):
+            yield Title(
+                id=pk,
+                name=self.text(self.random.randint(1, 4)).capitalize(),
+                year=self.random.randint(*YEARS),
+                description=self.text(20),
+                category_id=(self.random.choice(categories)
+                             if categories else None),
+            )
+
+    def genre_titles(self):
+        genres = self.ids(Genre)
+        for title_id in self.ids(Title):
+            count = min(len(genres), self.random.randint(1, self.max_genres))
+            for genre_id in self.random.sample(genres, count):
+                yield GenreTitle(title_id=title_id, genre_id=genre_id)
+
+    def reviews_per_title(self):
+        """Число отзывов на каждое произведение по закону Ципфа."""
+        titles = list(self.ids(Title))
+        self.random.shuffle(titles)
+        harmonic = sum(1 / rank ** self.skew
+                       for rank in range(1, len(titles) + 1))
+        users = len(self.ids(User))
+        weight = assigned = 0
+        for rank, title_id in enumerate(titles, 1):
+            weight += 1 / rank ** self.skew
+            # сверх числа авторов отзывов не бывает, остаток переносится
+            count = min(
+                round(self.counts[Review] * weight / harmonic) - assigned,
+                users,
+            )
+            assigned += count
+            yield title_id, count
+
+    def reviews(self):
+        users = self.ids(User)
+        if not users:
+            return
+        pk = self.first_id(Review)
+        for title_id, count in self.reviews_per_title():
+            # подряд идущие авторы дают уникальные пары (автор, произведение)
+            offset = self.random.randrange(len(users))
+            for step in range(count):
+                yield Review(
+                    id=pk, title_id=title_id,
+                    author_id=users[(offset + step) % len(users)],
+                    text=self.text(30), score=self.score(),
+                    pub_date=self.date(),
+                )
+                pk += 1
+
+    def score(self):
+        return min(10, max(1, round(self.random.gauss(7, 2))))
+
+    def comments(self):
+        users = self.ids(User)
+        reviews = self.ids(Review)
+        if not users or not reviews:
+            return
+        for pk in range(self.first_id(Comment),
+                        self.first_id(Comment) + self.counts[Comment]):
+            # отзывы популярных произведений созданы первыми
+            index = int(len(reviews) * self.random.random() ** 3)
+            yield Comment(id=pk, review_id=reviews[index],
+                          author_id=self.random.choice(users),
+                          text=self.text(15), pub_date=self.date())
+
+    def run(self):
+        """Создаёт данные, отдавая пары (модель, число объектов)."""
+        steps = (
+            (User, self.users),
+            (Category, lambda: self.slugged(Category, 'category')),
+            (Genre, lambda: self.slugged(Genre, 'genre')),
+            (Title, self.titles),
+            (GenreTitle, self.genre_titles),
+            (Review, self.reviews),
+            (Comment, self.comments),
+        )
+        for model, objs in steps:
+            # первый id считается до вставки
+            self.first_id(model)
+            yield model, self.write(model, objs())
+        Title.objects.filter(pk__gte=self.first_id(Title)).refresh_ratings()
@@ -0,0 +1,543 @@
+"""Потоковая пакетная загрузка данных из csv."""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+
+import django
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Category, Comment, Genre, GenreTitle, Review, Title, User
+from .signals import IN_QUERY_SIZE, bulk_changed, changed_titles
+
+DEFAULT_BATCH_SIZE = 1000
+# сколько известных id каждой модели держать в памяти
+ID_CACHE_SIZE = 100_000
+STDIN = '-'
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class CsvImportError(Exception):
+    """Файл csv не может быть загружен."""
+
+
+class Table:
+    """Описание csv-файла и модели, в которую он загружается."""
+
+    def __init__(self, filename, model, label, columns=None,
+                 foreign_keys=None, title_field=None):
+        self.filename = filename
+        self.name = filename.split('.')[0]
+        self.model = model
+        self.label = label
+        # колонка csv -> attname поля модели, если они не совпадают
+        self.columns = columns or {}
+        # attname внешнего ключа -> модель, на которую он ссылается
+        self.foreign_keys = foreign_keys or {}
+        # атрибут с id произведения, чьи рейтинг, топы и индексы
+        # меняет запись строки
+        self.title_field = title_field
+
+    def fields(self, columns):
+        """Поля модели, в которые загружаются колонки csv."""
+        return [self.model._meta.get_field(self.columns.get(column, column))
+                for column in columns]
+
+    def build(self, row):
+        """Создаёт объект модели из строки, проверяя значения полей."""
+        if None in row:
+            raise ValidationError('лишние значения в строке')
+        values = {}
+        for field, value in zip(self.fields(row), row.values()):
+            try:
+                if value == '' and field.null:
+                    values[field.attname] = None
+                elif field.is_relation:
+                    # наличие связанного объекта проверяет запись пачки
+                    values[field.attname] = field.to_python(value)
+                else:
+                    values[field.attname] = field.clean(value, None)
+            except ValidationError as error:
+                raise ValidationError(
+                    f'{field.name}: {"; ".join(error.messages)}'
+                ) from error
+        return self.model(**values)
+
+
+TABLES = (
+    Table('users.csv', User, 'пользователи'),
+    Table('category.csv', Category, 'категории'),
+    Table('genre.csv', Genre, 'жанры'),
+    Table('titles.csv', Title, 'произведения',
+          columns={'category': 'category_id'},
+          foreign_keys={'category_id': Category},
+          title_field='pk'),
+    Table('genre_title.csv', GenreTitle, 'жанры произведений',
+          foreign_keys={'title_id': Title, 'genre_id': Genre},
+          title_field='title_id'),
+    Table('review.csv', Review, 'отзывы',
+          columns={'author': 'author_id'},
+          foreign_keys={'title_id': Title, 'author_id': User},
+          title_field='title_id'),
+    Table('comments.csv', Comment, 'комментарии',
+          columns={'author': 'author_id'},
+          foreign_keys={'review_id': Review, 'author_id': User}),
+)
+TABLES_BY_NAME = {table.name: table for table in TABLES}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_chunk(table_name, chunk):
+    """Разбирает и проверяет пачку строк; выполняется в процессах пула.
+
+    Возвращает разобранные объекты и отклонённые строки с ошибками.
+    """
+    table = TABLES_BY_NAME[table_name]
+    parsed, rejected = [], []
+    for line, row in chunk:
+        try:
+            parsed.append((line, table.build(row)))
+        except ValidationError as error:
+            rejected.append((line, row, '; '.join(error.messages)))
+    return parsed, rejected
+
+
+def content_hash(obj, fields):
+    """Хэш значений полей в том виде, в каком они хранятся в базе."""
+    values = tuple(
+        field.get_db_prep_save(getattr(obj, field.attname), connection)
+        for field in fields
+    )
+    return hashlib.blake2b(repr(values).encode(), digest_size=16).digest()
+
+
+@contextmanager
+def open_csv(path):
+    """Открывает csv-файл или stdin (`-`), распаковывая gzip на лету."""
+    with ExitStack() as stack:
+        if path == STDIN:
+            binary = sys.stdin.buffer
+        else:
+            binary = stack.enter_context(open(path, 'rb'))
+        if binary.peek(2)[:2] == GZIP_MAGIC:
+            # GzipFile не закрывает файл, который ему передали
+            binary = stack.enter_context(gzip.GzipFile(fileobj=binary))
+        yield io.TextIOWrapper(binary, encoding='utf-8', newline='')
+
+
+def touch_auto_now(model, objs):
+    """Проставляет поля auto_now, которые bulk_update не заполняет."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)]
+    now = timezone.now()
+    for obj in objs:
+        for field in fields:
+            setattr(obj, field.attname, now)
+    return [field.name for field in fields]
+
+
+@contextmanager
+def keep_auto_now_add(model):
+    """Сохраняет даты из csv вместо подстановки auto_now_add."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class IdMap:
+    """Ограниченный по размеру кэш id, существующих в таблице модели."""
+
+    def __init__(self, model, max_size=ID_CACHE_SIZE):
+        self.model = model
+        self.max_size = max_size
+        self.known = set()
+
+    def existing(self, ids):
+        ids = set(ids)
+        found = ids & self.known
+        for missing in chunked(ids - self.known, IN_QUERY_SIZE):
+            found.update(self.model.objects
+                         .filter(pk__in=missing)
+                         .values_list('pk', flat=True))
+        self.add(found)
+        return found
+
+    def add(self, ids):
+        if len(self.known) + len(ids) > self.max_size:
+            self.known.clear()
+        self.known.update(ids)
+
+
+class Checkpoint:
+    """Число зафиксированных строк каждой таблицы, хранится в json."""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                self.state = json.load(file)
+        return self
+
+    def rows_done(self, table):
+        return self.state.get(table.name, {}).get('rows', 0)
+
+    def is_done(self, table):
+        return self.state.get(table.name, {}).get('done', False)
+
+    def save(self, table, rows, done=False):
+        self.state[table.name] = {'rows': rows, 'done': done}
+        if not self.path:
+            return
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        self.state = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RejectFile:
+    """Csv-файл с отклонёнными строками и причинами отказа."""
+
+    HEADER = ('file', 'line', 'error', 'row')
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.append = append
+        self.file = None
+        self.writer = None
+
+    def write(self, table, line, row, error):
+        if not self.path:
+            return
+        if self.writer is None:
+            exists = self.append and os.path.exists(self.path)
+            self.file = open(self.path, 'a' if exists else 'w',
+                             encoding='utf-8', newline='')
+            self.writer = csv.writer(self.file)
+            if not exists:
+                self.writer.writerow(self.HEADER)
+        self.writer.writerow((table.filename, line, error,
+                              json.dumps(row, ensure_ascii=False)))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = self.writer = None
+
+
+class TableStats:
+
+    def __init__(self, table):
+        self.table = table
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+        self.seconds = 0
+
+    def finish(self):
+        self.seconds = time.monotonic() - self.started
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.skipped + self.rejected
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else self.rows
+
+    def __str__(self):
+        return (f'{self.table.label}: добавлено {self.created}, '
+                f'обновлено {self.updated}, без изменений или пропущено '
+                f'{self.skipped}, отклонено {self.rejected} '
+                f'за {self.seconds:.2f} с '
+                f'({self.rows_per_second:.0f} строк/с)')
+
+
+class Importer:
+    """Загружает таблицы через bulk_create пачками в транзакциях.
+
+    Строки читаются потоком и обрабатываются пачками по `batch_size`:
+    на пачку приходится по одному запросу на проверку id и внешних
+    ключей и одна транзакция на вставку вместе с пересчётом рейтингов,
+    топов и индексов затронутых произведений. После каждой пачки в
+    контрольную точку записывается число обработанных строк, так что
+    прерванный импорт можно продолжить с того же места.
+
+    По умолчанию строки с уже существующим id пропускаются. В режиме
+    `incremental` они сравниваются с хранимыми по хэшу содержимого и
+    изменившиеся обновляются через bulk_update.
+
+    Разбор и проверка строк идут параллельно в пуле из `workers`
+    процессов, а запись выполняет один текущий процесс, по таблицам в
+    порядке зависимостей. Невалидные строки, строки со ссылками на
+    отсутствующие объекты и нарушающие ограничения базы строки не
+    прерывают импорт, а пишутся в `rejects`.
+    """
+
+    def __init__(self, data_dir, batch_size=DEFAULT_BATCH_SIZE,
+                 checkpoint=None, incremental=False, workers=1,
+                 rejects=None):
+        self.data_dir = data_dir
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint or Checkpoint(None)
+        self.incremental = incremental
+        self.workers = workers
+        self.rejects = rejects or RejectFile(None)
+        self.pool = None
+        self.id_maps = {}
+        self.paths = {}
+        self.headers = {}
+
+    def id_map(self, model):
+        if model not in self.id_maps:
+            self.id_maps[model] = IdMap(model)
+        return self.id_maps[model]
+
+    def set_path(self, table, path):
+        self.paths[table.name] = path
+
+    def path(self, table):
+        if table.name in self.paths:
+            return self.paths[table.name]
+        path = os.path.join(self.data_dir, table.filename)
+        if not os.path.exists(path) and os.path.exists(f'{path}.gz'):
+            return f'{path}.gz'
+        return path
+
+    def read_rows(self, table, skip=0):
+        """Отдаёт пары (номер строки файла, строка), пропуская `skip`."""
+        with open_csv(self.path(table)) as file:
+            reader = csv.DictReader(file)
+            try:
+                table.fields(reader.fieldnames or ())
+            except FieldDoesNotExist as error:
+                raise CsvImportError(f'{table.filename}: {error}') from error
+            self.headers[table.name] = reader.fieldnames
+            for row in islice(reader, skip, None):
+                yield reader.line_num, row
+
+    def parsed_chunks(self, table, rows):
+        """Отдаёт разобранные пачки в исходном порядке.
+
+        Одновременно в пуле находится не больше `2 * workers` пачек,
+        так что память ограничена независимо от размера файла.
+        """
+        chunks = chunked(rows, self.batch_size)
+        if self.pool is None:
+            for chunk in chunks:
+                yield len(chunk), parse_chunk(table.name, chunk)
+            return
+        pending = deque()
+        for chunk in chunks:
+            pending.append(
+                (len(chunk), self.pool.submit(parse_chunk, table.name, chunk))
+            )
+            if len(pending) >= 2 * self.workers:
+                size, future = pending.popleft()
+                yield size, future.result()
+        while pending:
+            size, future = pending.popleft()
+            yield size, future.result()
+
+    def reject(self, table, stats, line, row, error):
+        self.rejects.write(table, line, row, error)
+        stats.rejected += 1
+
+    def reject_object(self, table, stats, line, obj, error):
+        self.reject(
+            table, stats, line,
+            {field.attname: str(getattr(obj, field.attname))
+             for field in table.fields(self.headers[table.name])},
+            error
+        )
+
+    def check_foreign_keys(self, table, chunk, stats):
+        """Отклоняет строки со ссылками на отсутствующие объекты."""
+        for attname, model in table.foreign_keys.items():
+            found = self.id_map(model).existing(
+                getattr(obj, attname) for _, obj in chunk
+                if getattr(obj, attname) is not None
+            )
+            valid = []
+            for line, obj in chunk:
+                value = getattr(obj, attname)
+                if value is None or value in found:
+                    valid.append((line, obj))
+                    continue
+                self.reject_object(
+                    table, stats, line, obj,
+                    f'{attname}={value}: нет объекта '
+                    f'{model._meta.verbose_name}'
+                )
+            chunk = valid
+        return chunk
+
+    def write_batch(self, table, new, changed=(), fields=None, old=()):
+        """Записывает объекты и зависящие от них данные в одной
+        транзакции; old — прежние версии изменённых объектов."""
+        with transaction.atomic(), keep_auto_now_add(table.model):
+            table.model.objects.bulk_create(new, batch_size=self.batch_size)
+            if changed:
+                table.model.objects.bulk_update(
+                    changed, fields + touch_auto_now(table.model, changed),
+                    batch_size=self.batch_size
+                )
+            self.propagate(table, [*new, *changed], old)
+
+    def propagate(self, table, written, old):
+        """Пересчитывает рейтинги и рассылает bulk_changed для
+        записанных строк: читатели не видят строк, ещё не учтённых
+        в рейтингах, топах и индексах, а прерванный импорт не оставляет
+        неучтённых строк."""
+        extra = {'pks': [obj.pk for obj in written]}
+        if table.title_field:
+            # у изменённой строки затронуты и прежнее, и новое произведение
+            extra['title_ids'] = {getattr(obj, table.title_field)
+                                  for obj in [*written, *old]}
+            if table.model is Review:
+                for titles in changed_titles(extra['title_ids']):
+                    titles.refresh_ratings()
+        bulk_changed.send(sender=table.model, **extra)
+
+    def write(self, table, stats, new, changed=(), fields=None,
+              stored=None):
+        """Записывает пары (номер строки, объект): новые и изменённые.
+
+        stored — хранимые версии изменённых объектов по id.
+
+        Если пачка нарушает ограничения базы (повторные имя или email
+        под новым id, второй отзыв автора на произведение), она
+        записывается заново по одной строке, а нарушающие строки
+        отклоняются. Возвращает записанные новые и изменённые пары.
+        """
+        stored = stored or {}
+        try:
+            self.write_batch(table, [obj for _, obj in new],
+                             [obj for _, obj in changed], fields,
+                             [stored[obj.pk] for _, obj in changed])
+            return new, changed
+        except IntegrityError:
+            pass
+        written_new, written_changed = [], []
+        for pairs, written, is_new in ((new, written_new, True),
+                                       (changed, written_changed, False)):
+            for line, obj in pairs:
+                try:
+                    if is_new:
+                        self.write_batch(table, [obj])
+                    else:
+                        self.write_batch(table, [], [obj], fields,
+                                         [stored[obj.pk]])
+                except IntegrityError as error:
+                    self.reject_object(table, stats, line, obj, str(error))
+                else:
+                    written.append((line, obj))
+        return written_new, written_changed
+
+    def import_chunk(self, table, chunk, stats):
+        chunk = self.check_foreign_keys(table, chunk, stats)
+        id_map = self.id_map(table.model)
+        existing = id_map.existing(obj.pk for _, obj in chunk)
+        new = {}
+        for line, obj in chunk:
+            if obj.pk in existing or obj.pk in new:
+                stats.skipped += 1
+            else:
+                new[obj.pk] = (line, obj)
+        if new:
+            new, _ = self.write(table, stats, list(new.values()))
+            id_map.add([obj.pk for _, obj in new])
+            stats.created += len(new)
+
+    def import_chunk_incremental(self, table, chunk, stats):
+        chunk = self.check_foreign_keys(table, chunk, stats)
+        fields = table.fields(self.headers[table.name])
+        incoming = {}
+        for line, obj in chunk:
+            if obj.pk in incoming:
+                stats.skipped += 1
+            incoming[obj.pk] = (line, obj)
+        stored = (table.model.objects
+                  .only(*(field.name for field in fields))
+                  .in_bulk(list(incoming)))
+        new, changed = [], []
+        for pk, (line, obj) in incoming.items():
+            if pk not in stored:
+                new.append((line, obj))
+            elif (content_hash(obj, fields)
+                  != content_hash(stored[pk], fields)):
+                changed.append((line, obj))
+            else:
+                stats.skipped += 1
+        if new or changed:
+            new, changed = self.write(table, stats, new, changed, [
+                field.name for field in fields if not field.primary_key
+            ], stored)
+            self.id_map(table.model).add([obj.pk for _, obj in new])
+            stats.created += len(new)
+            stats.updated += len(changed)
+
+    def import_table(self, table):
+        stats = TableStats(table)
+        rows_done = self.checkpoint.rows_done(table)
+        rows = self.read_rows(table, rows_done)
+        import_chunk = (self.import_chunk_incremental if self.incremental
+                        else self.import_chunk)
+        for size, (parsed, rejected) in self.parsed_chunks(table, rows):
+            for line, row, error in rejected:
+                self.reject(table, stats, line, row, error)
+            import_chunk(table, parsed, stats)
+            rows_done += size
+            self.checkpoint.save(table, rows_done)
+        self.checkpoint.save(table, rows_done, done=True)
+        stats.finish()
+        return stats
+
+    def run(self, tables=TABLES):
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(self.workers,
+                                            initializer=django.setup)
+        try:
+            for table in tables:
+                if self.checkpoint.is_done(table):
+                    continue
+                yield self.import_table(table)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+            self.rejects.close()
+        self.checkpoint.clear()
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from reviews.generator import DEFAULT_BATCH_SIZE, Generator
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными заданного объёма '
+            'для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='число пользователей')
+        parser.add_argument('--categories', type=int, default=10,
+                            help='число категорий')
+        parser.add_argument('--genres', type=int, default=30,
+                            help='число жанров')
+        parser.add_argument('--titles', type=int, default=10000,
+                            help='число произведений')
+        parser.add_argument('--reviews', type=int, default=100000,
+                            help='число отзывов (не больше)')
+        parser.add_argument('--comments', type=int, default=100000,
+                            help='число комментариев')
+        parser.add_argument('--max-genres', type=int, default=3,
+                            help='максимум жанров у произведения')
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help=('показатель закона Ципфа для числа отзывов на '
+                  'произведение, 0 — равномерно'),
+        )
+        parser.add_argument('--batch-size', type=int,
+                            default=DEFAULT_BATCH_SIZE,
+                            help='число объектов в одной вставке')
+        parser.add_argument('--seed', type=int,
+                            help='зерно генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        generator = Generator(
+            users=options['users'],
+            categories=options['categories'],
+            genres=options['genres'],
+            titles=options['titles'],
+            reviews=options['reviews'],
+            comments=options['comments'],
+            max_genres=options['max_genres'],
+            skew=options['skew'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+        )
+        for model, count in generator.run():
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: создано {count}'
+            )
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
@@ -1,109 +1,104 @@
-from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.shortcuts import get_object_or_404
-
 import os
-import csv
-from reviews.models import (Category, Comment, Genre,
-                            GenreTitle, Review, Title, User)
 
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
-def process_file(name: str):
-    return csv.reader(open(os.path.join(settings.BASE_DIR,
-                                        'static/data/',
-                                        name), 'r', encoding='utf-8'),
-                      delimiter=',')
+from reviews.importer import (DEFAULT_BATCH_SIZE, TABLES, TABLES_BY_NAME,
+                              Checkpoint, CsvImportError, Importer,
+                              RejectFile)
 
 
 class Command(BaseCommand):
+    help = ('Загружает данные из csv-файлов в базу. Файлы могут быть '
+            'сжаты gzip (*.csv.gz), одну таблицу можно подать через stdin.')
 
-    def handle(self, *args, **options):
-
-        # парсер юзеров
-        csv = process_file('users.csv')
-        next(csv, None)
-        for row in csv:
-            obj, created = User.objects.get_or_create(id=row[0],
-                                                      username=row[1],
-                                                      email=row[2],
-                                                      role=row[3],
-                                                      bio=row[4],
-                                                      first_name=row[5],
-                                                      last_name=row[6])
-        print('парсер пользователей прошел успешно')
-
-        # парсер категорий
-        csv = process_file('category.csv')
-        next(csv, None)
-        for row in csv:
-            obj, created = Category.objects.get_or_create(id=row[0],
-                                                          name=row[1],
-                                                          slug=row[2])
-        print('парсер категорий прошел успешно')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'static/data/'),
+            help='каталог с csv-файлами',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='число строк в одной пачке (и транзакции)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='число процессов для разбора и проверки строк',
+        )
+        parser.add_argument(
+            '--reject-file',
+            default=os.path.join(settings.BASE_DIR,
+                                 'import_csv.rejects.csv'),
+            help='csv-файл для отклонённых строк',
+        )
+        parser.add_argument(
+            '--table',
+            choices=TABLES_BY_NAME,
+            help='загрузить только одну таблицу',
+        )
+        parser.add_argument(
+            '--file',
+            help='файл для таблицы из --table, `-` — читать из stdin',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR,
+                                 'import_csv.checkpoint.json'),
+            help='файл контрольной точки',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help=('сравнить строки с существующими по хэшу содержимого и '
+                  'обновить изменившиеся'),
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='продолжить прерванный импорт с контрольной точки',
+        )
 
-        # парсер жанров
-        csv = process_file('genre.csv')
-        next(csv, None)
-        for row in csv:
-            obj, created = Genre.objects.get_or_create(id=row[0],
-                                                       name=row[1],
-                                                       slug=row[2])
-        print('парсер жанров прошел успешно')
-
-        # парсер титлов
-        csv = process_file('titles.csv')
-        next(csv, None)
-        for row in csv:
-            obj, created = (Title
-                            .objects
-                            .get_or_create(id=row[0],
-                                           name=row[1],
-                                           year=row[2],
-                                           category=get_object_or_404(Category,
-                                                                      id=row[3]
-                                                                      )))
-        print('парсер титлов прошел успешно')
-
-        # пасрер жанро-титлов
-        csv = process_file('genre_title.csv')
-        next(csv, None)
-        for row in csv:
-            obj, created = (GenreTitle
-                            .objects
-                            .get_or_create(id=row[0],
-                                           title=get_object_or_404(Title,
-                                                                   id=row[1]),
-                                           genre=get_object_or_404(Genre,
-                                                                   id=row[2])))
-        print('зависимости между жанрами и произведениями установлены')
-
-        # парсер отзывов
-        csv = process_file('review.csv')
-        next(csv, None)
-        for row in csv:
-            obj, created = (Review
-                            .objects
-                            .get_or_create(id=row[0],
-                                           title=get_object_or_404(Title,
-                                                                   id=row[1]),
-                                           text=row[2],
-                                           author=get_object_or_404(User,
-                                                                    id=row[3]),
-                                           score=row[4],
-                                           pub_date=row[5]))
-        print('парсер отзывов завершен')
-
-        # парсер коментов
-        csv = process_file('comments.csv')
-        next(csv, None)
-        for row in csv:
-            obj, created = (Comment
-                            .objects
-                            .get_or_create(id=row[0],
-                                           review=get_object_or_404(Review,
-                                                                    id=row[1]),
-                                           text=row[2],
-                                           author=get_object_or_404(User,
-                                                                    id=row[3]),
-                                           pub_date=row[4]))
-        print('комментарии установлены')
+    def handle(self, *args, **options):
+        if options['file'] and not options['table']:
+            raise CommandError('--file можно указать только вместе с --table')
+        checkpoint = Checkpoint(options['checkpoint'])
+        if options['resume']:
+            checkpoint.load()
+        else:
+            checkpoint.clear()
+        importer = Importer(
+            options['path'], options['batch_size'], checkpoint,
+            incremental=options['incremental'],
+            workers=options['workers'],
+            rejects=RejectFile(options['reject_file'],
+                               append=options['resume']),
+        )
+        tables = TABLES
+        if options['table']:
+            tables = (TABLES_BY_NAME[options['table']],)
+            if options['file']:
+                importer.set_path(tables[0], options['file'])
+        created = updated = skipped = rejected = 0
+        try:
+            for stats in importer.run(tables):
+                self.stdout.write(str(stats))
+                created += stats.created
+                updated += stats.updated
+                skipped += stats.skipped
+                rejected += stats.rejected
+        except CsvImportError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'импорт завершен: добавлено {created}, обновлено {updated}, '
+            f'без изменений или пропущено {skipped}'
+        ))
+        if rejected:
+            self.stdout.write(self.style.WARNING(
+                f'отклонено строк: {rejected}, '
+                f'см. {options["reject_file"]}'
+            ))
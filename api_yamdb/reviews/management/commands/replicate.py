@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api_yamdb.db import replicate
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики из DATABASE_REPLICAS. '
+            'Заменяет репликацию при локальной проверке чтения из реплик.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='копировать каждые N секунд, пока не прервут',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте '
+                               'DATABASE_REPLICAS')
+        databases = settings.DATABASES
+        if any(databases[alias]['ENGINE'] != 'django.db.backends.sqlite3'
+               for alias in ('default', *settings.DATABASE_REPLICAS)):
+            raise CommandError('Копирование поддерживается только для SQLite')
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                replicate(databases['default']['NAME'],
+                          databases[alias]['NAME'])
+            self.stdout.write(
+                f'Реплики обновлены: {", ".join(settings.DATABASE_REPLICAS)}'
+            )
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
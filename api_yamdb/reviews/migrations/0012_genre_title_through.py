@@ -0,0 +1,80 @@
+# Generated by Django 3.2 on 2026-10-18 02:18
+
+from django.db import migrations, models
+from django.db.models import Min
+import django.db.models.deletion
+
+
+def merge_genre_links(apps, schema_editor):
+    """Переносит связи из таблицы ManyToManyField в GenreTitle.
+
+    Дубли пар (произведение, жанр) удаляются, остаётся запись
+    с наименьшим id.
+    """
+    db = schema_editor.connection.alias
+    Title = apps.get_model('reviews', 'Title')
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    keep = (GenreTitle.objects.using(db)
+            .values('title', 'genre')
+            .annotate(keep=Min('id'))
+            .values('keep'))
+    GenreTitle.objects.using(db).exclude(id__in=keep).delete()
+    linked = set(GenreTitle.objects.using(db)
+                 .values_list('title_id', 'genre_id'))
+    GenreTitle.objects.using(db).bulk_create(
+        GenreTitle(title_id=title_id, genre_id=genre_id)
+        for title_id, genre_id in (Title.genre.through.objects.using(db)
+                                   .values_list('title_id', 'genre_id'))
+        if (title_id, genre_id) not in linked
+    )
+
+
+def split_genre_links(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Title = apps.get_model('reviews', 'Title')
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    Title.genre.through.objects.using(db).bulk_create(
+        Title.genre.through(title_id=title_id, genre_id=genre_id)
+        for title_id, genre_id in (GenreTitle.objects.using(db)
+                                   .values_list('title_id', 'genre_id'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_genre_links, split_genre_links),
+        # through нельзя добавить через AlterField: таблица
+        # ManyToManyField удаляется, связи уже перенесены в GenreTitle
+        migrations.RemoveField(
+            model_name='title',
+            name='genre',
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='genre',
+            field=models.ManyToManyField(blank=True, help_text='добавьте жанр', related_name='titles', through='reviews.GenreTitle', to='reviews.Genre', verbose_name='жанр'),
+        ),
+        migrations.AlterField(
+            model_name='genretitle',
+            name='genre',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='reviews.genre', verbose_name='жанр'),
+        ),
+        migrations.AlterField(
+            model_name='genretitle',
+            name='title',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='reviews.title', verbose_name='произведение'),
+        ),
+        migrations.AddIndex(
+            model_name='genretitle',
+            index=models.Index(fields=['genre', 'title'], name='genre_title_genre_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='genretitle',
+            constraint=models.UniqueConstraint(fields=('title', 'genre'), name='unique_genre_title'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2 on 2026-10-18 02:27
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_leaderboard(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Title = apps.get_model('reviews', 'Title')
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    LeaderboardEntry = apps.get_model('reviews', 'LeaderboardEntry')
+    rated = Title.objects.using(db).filter(
+        rating_count__gte=settings.LEADERBOARD_MIN_REVIEWS
+    )
+    genres = defaultdict(list)
+    for title_id, genre_id in (GenreTitle.objects.using(db)
+                               .filter(title__in=rated)
+                               .values_list('title_id', 'genre_id')):
+        genres[title_id].append(genre_id)
+    entries = []
+    for title_id, rating_sum, rating_count, category_id in (
+            rated.values_list('pk', 'rating_sum', 'rating_count',
+                              'category_id')):
+        entry = {'title_id': title_id,
+                 'rating': rating_sum / rating_count,
+                 'rating_count': rating_count}
+        entries.append(LeaderboardEntry(**entry))
+        if category_id is not None:
+            entries.append(LeaderboardEntry(category_id=category_id, **entry))
+        entries.extend(LeaderboardEntry(genre_id=genre_id, **entry)
+                       for genre_id in genres[title_id])
+    LeaderboardEntry.objects.using(db).bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_title_category_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.FloatField(verbose_name='средняя оценка')),
+                ('rating_count', models.PositiveIntegerField(verbose_name='число оценок')),
+                ('category', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='reviews.category', verbose_name='категория')),
+                ('genre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='reviews.genre', verbose_name='жанр')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='reviews.title', verbose_name='произведение')),
+            ],
+            options={
+                'verbose_name': 'место в топе',
+                'verbose_name_plural': 'топы произведений',
+                'default_related_name': 'leaderboard_entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['category', 'genre', '-rating', '-rating_count', 'title'], name='leaderboard_top_idx'),
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
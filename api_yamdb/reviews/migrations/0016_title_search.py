@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from reviews.search import TITLE_INDEX
+
+
+def create_index(apps, schema_editor):
+    using = schema_editor.connection.alias
+    if TITLE_INDEX.available(using):
+        TITLE_INDEX.create(using)
+
+
+def drop_index(apps, schema_editor):
+    using = schema_editor.connection.alias
+    if TITLE_INDEX.available(using):
+        TITLE_INDEX.drop(using)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0015_score_histogram'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
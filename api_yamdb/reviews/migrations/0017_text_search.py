@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from reviews.search import COMMENT_INDEX, REVIEW_INDEX
+
+INDEXES = (REVIEW_INDEX, COMMENT_INDEX)
+
+
+def create_indexes(apps, schema_editor):
+    using = schema_editor.connection.alias
+    for index in INDEXES:
+        if index.available(using):
+            index.create(using)
+
+
+def drop_indexes(apps, schema_editor):
+    using = schema_editor.connection.alias
+    for index in INDEXES:
+        if index.available(using):
+            index.drop(using)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0016_title_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
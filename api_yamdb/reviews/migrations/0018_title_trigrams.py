@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 03:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from reviews.search import trigrams
+
+
+def fill_trigrams(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Title = apps.get_model('reviews', 'Title')
+    TitleTrigram = apps.get_model('reviews', 'TitleTrigram')
+    TitleTrigram.objects.using(db).bulk_create(
+        (TitleTrigram(title_id=title_id, trigram=trigram)
+         for title_id, name in (Title.objects.using(db)
+                                .values_list('pk', 'name').iterator())
+         for trigram in trigrams(name)),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0017_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3, verbose_name='триграмма')),
+            ],
+            options={
+                'verbose_name': 'триграмма названия',
+                'verbose_name_plural': 'триграммы названий',
+                'default_related_name': 'trigrams',
+            },
+        ),
+        migrations.AddField(
+            model_name='titletrigram',
+            name='title',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='reviews.title', verbose_name='произведение'),
+        ),
+        migrations.AddIndex(
+            model_name='titletrigram',
+            index=models.Index(fields=['trigram', 'title'], name='title_trigram_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='titletrigram',
+            constraint=models.UniqueConstraint(fields=('title', 'trigram'), name='unique_title_trigram'),
+        ),
+        migrations.RunPython(fill_trigrams, migrations.RunPython.noop),
+    ]
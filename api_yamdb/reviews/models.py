@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, Exists, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Length, Now
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils import timezone
 
 
 import datetime
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 
+from .search import similarity, trigrams
 from .validators import validate_username, validate_year
 
 
@@ -18,6 +26,13 @@ FIRST_NAME_MAX_LENGTH = 150
 LAST_NAME_MAX_LENGTH = 150
 ROLE_CHOICE_MAX_LENGTH = 9
 NAME_MAX_LENGHT = 256
+SCORES = range(1, 11)
+# счётчики оценок произведения: их меняют только отзывы
+RATING_FIELDS = ('rating_sum', 'rating_count',
+                 *(f'score_{score}' for score in SCORES))
+LEADERBOARD_BATCH_SIZE = 500
+TRIGRAM_BATCH_SIZE = 2000
+TRIGRAM_MAX_LENGTH = 3
 SLUG_MAX_LENGHT = 50
 ROLE_CHOICES = [
     (USER, USER),
@@ -26,6 +41,39 @@ ROLE_CHOICES = [
 ]
 
 
+# произведения, чей рейтинг изменило каскадное удаление отзывов
+deferred_ratings = ContextVar('deferred_ratings', default=None)
+
+
+@contextmanager
+def defer_rating_updates(using=None):
+    """Пересчитывает рейтинг один раз после удаления многих отзывов.
+
+    Без этого каскадное удаление обновляет произведение на каждый отзыв.
+    """
+    if deferred_ratings.get() is not None:
+        yield
+        return
+    titles = set()
+    token = deferred_ratings.set(titles)
+    try:
+        with transaction.atomic(using=using):
+            yield
+            if titles:
+                (Title.objects.using(using)
+                 .filter(pk__in=titles).refresh_ratings())
+    finally:
+        deferred_ratings.reset(token)
+
+
+def remember_shown(instance):
+    """Запоминает поля, которые показываются в представлениях других
+    объектов: по ним сигналы узнают о переименовании."""
+    if all(field in instance.__dict__ for field in instance.SHOWN_FIELDS):
+        instance._shown = tuple(instance.__dict__[field]
+                                for field in instance.SHOWN_FIELDS)
+
+
 class User(AbstractUser):
     username = models.CharField(
         max_length=USERNAME_MAX_LENGTH,
@@ -68,6 +116,9 @@ class User(AbstractUser):
         null=True
     )
 
+    # показывается в отзывах и комментариях
+    SHOWN_FIELDS = ('username',)
+
     class Meta:
         ordering = ('username',)
         verbose_name = 'Пользователь'
@@ -82,6 +133,17 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        remember_shown(instance)
+        return instance
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with defer_rating_updates(using):
+            return super().delete(using, keep_parents)
+
 
 class Category(models.Model):
     name = models.CharField(max_length=NAME_MAX_LENGHT,
@@ -92,6 +154,9 @@ class Category(models.Model):
                             verbose_name='уникальный слаг',
                             help_text='придумайте слаг')
 
+    # показывается в произведениях
+    SHOWN_FIELDS = ('name', 'slug')
+
     class Meta:
         ordering = ['name']
         verbose_name = 'Категория'
@@ -100,6 +165,12 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        remember_shown(instance)
+        return instance
+
 
 class Genre(models.Model):
     name = models.CharField(max_length=NAME_MAX_LENGHT,
@@ -110,6 +181,9 @@ class Genre(models.Model):
                             verbose_name='уникальный слаг',
                             help_text='придумайте слаг')
 
+    # показывается в произведениях
+    SHOWN_FIELDS = ('name', 'slug')
+
     class Meta:
         ordering = ['name']
         verbose_name = 'Жанр'
@@ -118,6 +192,40 @@ class Genre(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        remember_shown(instance)
+        return instance
+
+
+class TitleQuerySet(models.QuerySet):
+
+    def refresh_ratings(self):
+        """Пересчитывает сохранённые суммы, количества и гистограммы
+        оценок и места произведений в топах."""
+        reviews = (Review.objects
+                   .filter(title=OuterRef('pk'))
+                   .order_by()
+                   .values('title'))
+
+        def total(reviews, aggregate):
+            return Coalesce(
+                Subquery(reviews.annotate(total=aggregate).values('total')), 0
+            )
+
+        updated = self.update(
+            modified=Now(),
+            rating_sum=total(reviews, Sum('score')),
+            rating_count=total(reviews, Count('id')),
+            **{f'score_{score}': total(reviews.filter(score=score),
+                                       Count('id'))
+               for score in SCORES},
+        )
+        if updated:
+            LeaderboardEntry.objects.rebuild(self)
+        return updated
+
 
 class Title(models.Model):
     name = models.CharField(max_length=NAME_MAX_LENGHT,
@@ -130,25 +238,71 @@ class Title(models.Model):
     description = models.TextField('описание произведения',
                                    help_text='добавьте описание')
     genre = models.ManyToManyField(Genre,
+                                   through='GenreTitle',
                                    blank=True,
-                                   db_index=True,
                                    verbose_name='жанр',
                                    help_text='добавьте жанр')
     category = models.ForeignKey(Category,
                                  blank=True,
                                  null=True,
                                  on_delete=models.SET_NULL,
-                                 db_index=True,
+                                 db_index=False,
                                  verbose_name='категория',
                                  help_text=('категория,'
                                             'к которой будет '
                                             'относиться произведение'))
+    rating_sum = models.PositiveIntegerField(default=0,
+                                             editable=False,
+                                             verbose_name='сумма оценок')
+    rating_count = models.PositiveIntegerField(default=0,
+                                               editable=False,
+                                               verbose_name='число оценок')
+    # счётчики оценок каждого балла, обновляются вместе с rating_sum
+    score_1 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 1')
+    score_2 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 2')
+    score_3 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 3')
+    score_4 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 4')
+    score_5 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 5')
+    score_6 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 6')
+    score_7 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 7')
+    score_8 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 8')
+    score_9 = models.PositiveIntegerField(default=0,
+                                          editable=False,
+                                          verbose_name='число оценок 9')
+    score_10 = models.PositiveIntegerField(default=0,
+                                           editable=False,
+                                           verbose_name='число оценок 10')
+    modified = models.DateTimeField('дата изменения', auto_now=True)
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         ordering = ['name']
         default_related_name = 'titles'
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
+        indexes = [
+            # фильтр по категории и диапазону лет; заменяет индекс
+            # внешнего ключа category
+            models.Index(fields=['category', 'year'],
+                         name='title_category_year_idx'),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(year__lte=datetime.datetime.now().year),
@@ -159,22 +313,117 @@ class Title(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # категория, уже учтённая в топах LeaderboardEntry
+        instance._ranked_category_id = instance.__dict__.get('category_id')
+        # название, по которому построены триграммы TitleTrigram
+        instance._indexed_name = instance.__dict__.get('name')
+        return instance
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        # счётчики оценок не перезаписываются: иначе сохранение
+        # загруженного раньше экземпляра теряет оценки новых отзывов
+        if update_fields is None and not force_insert and not (
+            self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in RATING_FIELDS
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with defer_rating_updates(using):
+            return super().delete(using, keep_parents)
+
+    @property
+    def rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum // self.rating_count
+
+    @property
+    def score_histogram(self):
+        """Число оценок каждого балла, от 1 до 10."""
+        return {score: getattr(self, f'score_{score}') for score in SCORES}
+
+    @property
+    def median_score(self):
+        if not self.rating_count:
+            return None
+        # средние по порядку оценки; при нечётном числе — одна и та же
+        positions = ((self.rating_count - 1) // 2, self.rating_count // 2)
+        middle = []
+        seen = 0
+        for score, count in self.score_histogram.items():
+            middle.extend(score for position in positions
+                          if seen <= position < seen + count)
+            seen += count
+        return sum(middle) / 2
+
+
+class GenreTitleQuerySet(models.QuerySet):
+
+    def unlink(self):
+        """Убирает связи из топов жанров и меняет дату изменения их
+        произведений; вызывается до удаления связей."""
+        Title.objects.filter(
+            pk__in=self.values('title_id')
+        ).update(modified=timezone.now())
+        LeaderboardEntry.objects.filter(Exists(self.filter(
+            title=OuterRef('title'), genre=OuterRef('genre')
+        ))).delete()
+
+    def delete(self):
+        # сюда же приходят title.genre.remove()/clear() и удаление
+        # из админки; каскад от произведения или жанра идёт мимо
+        with transaction.atomic(using=self.db, savepoint=False):
+            self.unlink()
+            return super().delete()
+
 
 class GenreTitle(models.Model):
+    # отдельные индексы не нужны: их заменяют составные из Meta
     genre = models.ForeignKey(Genre,
                               on_delete=models.CASCADE,
+                              db_index=False,
                               verbose_name='жанр')
     title = models.ForeignKey(Title,
                               on_delete=models.CASCADE,
+                              db_index=False,
                               verbose_name='произведение')
 
+    objects = GenreTitleQuerySet.as_manager()
+
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['title', 'genre'],
+                                    name='unique_genre_title'),
+        ]
+        indexes = [
+            # произведения жанра для фильтра ?genre=
+            models.Index(fields=['genre', 'title'],
+                         name='genre_title_genre_idx'),
+        ]
         verbose_name = 'связь жанра и произведения'
         verbose_name_plural = 'соответствие жанров и произведений'
 
     def __str__(self) -> str:
         return f'{self.title} является {self.genre}'
 
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            GenreTitle.objects.using(using).filter(pk=self.pk).unlink()
+            return super().delete(using, keep_parents)
+
 
 class Review(models.Model):
     author = models.ForeignKey(
@@ -192,6 +441,7 @@ class Review(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    modified = models.DateTimeField('Дата изменения', auto_now=True)
     score = models.IntegerField(
         verbose_name="Оценка",
         default=1,
@@ -204,6 +454,14 @@ class Review(models.Model):
     class Meta:
         ordering = ['pub_date']
         default_related_name = 'reviews'
+        indexes = [
+            # страницы отзывов произведения в порядке публикации
+            models.Index(fields=['title', 'pub_date'],
+                         name='review_title_pub_date_idx'),
+            # пересчёт рейтинга читает оценки только из индекса
+            models.Index(fields=['title', 'score'],
+                         name='review_title_score_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["author", "title"], name="unique_review"
@@ -215,6 +473,26 @@ class Review(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rating_state()
+        return instance
+
+    def remember_rating_state(self):
+        """Запоминает оценку, уже учтённую в рейтинге произведения."""
+        if 'title_id' in self.__dict__ and 'score' in self.__dict__:
+            self._rated = (self.title_id, self.score)
+        else:
+            self.__dict__.pop('_rated', None)
+
+    def save(self, *args, **kwargs):
+        # рейтинг произведения обновляется сигналами в той же транзакции
+        using = (kwargs.get('using')
+                 or router.db_for_write(type(self), instance=self))
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     review = models.ForeignKey(
@@ -231,9 +509,214 @@ class Comment(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    modified = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         ordering = ['pub_date']
         default_related_name = 'comments'
+        indexes = [
+            models.Index(fields=['review', 'pub_date'],
+                         name='comment_review_pub_date_idx'),
+        ]
         verbose_name = 'комментарий'
         verbose_name_plural = 'коментарии'
+
+
+class LeaderboardQuerySet(models.QuerySet):
+
+    def top(self, category=None, genre=None):
+        """Топ произведений: общий, категории или жанра."""
+        return (self.filter(category=category, genre=genre)
+                .order_by('-rating', '-rating_count', 'title_id'))
+
+    def rebuild(self, titles):
+        """Пересоздаёт записи топов для произведений из titles."""
+        self.filter(title__in=titles).delete()
+        rated = titles.filter(
+            rating_count__gte=settings.LEADERBOARD_MIN_REVIEWS
+        ).order_by().only('rating_sum', 'rating_count', 'category_id')
+        genres = defaultdict(list)
+        for title_id, genre_id in (GenreTitle.objects
+                                   .filter(title__in=rated)
+                                   .values_list('title_id', 'genre_id')):
+            genres[title_id].append(genre_id)
+        entries = []
+        for title in rated:
+            entries.append(LeaderboardEntry.for_title(title))
+            if title.category_id is not None:
+                entries.append(LeaderboardEntry.for_title(
+                    title, category_id=title.category_id
+                ))
+            entries.extend(LeaderboardEntry.for_title(title, genre_id=genre_id)
+                           for genre_id in genres[title.pk])
+        self.bulk_create(entries, batch_size=LEADERBOARD_BATCH_SIZE)
+
+    def set_category(self, title):
+        """Переносит произведение в топ его новой категории."""
+        self.filter(title=title, category__isnull=False).delete()
+        if title.category_id is not None:
+            self.bulk_create([LeaderboardEntry.for_title(
+                title, category_id=title.category_id
+            )])
+
+    def add_genres(self, title, genre_ids):
+        self.bulk_create(LeaderboardEntry.for_title(title, genre_id=genre_id)
+                         for genre_id in genre_ids)
+
+    def refresh_title(self, title_id):
+        """Переносит в топы новый рейтинг произведения.
+
+        Обычно это один UPDATE; записи пересоздаются, только когда
+        произведение впервые набрало LEADERBOARD_MIN_REVIEWS оценок.
+        """
+        title = (Title.objects.filter(pk=title_id)
+                 .values_list('rating_sum', 'rating_count').first())
+        if title is None:
+            return
+        rating_sum, rating_count = title
+        entries = self.filter(title_id=title_id)
+        if rating_count < settings.LEADERBOARD_MIN_REVIEWS:
+            entries.delete()
+        elif not entries.update(rating=rating_sum / rating_count,
+                                rating_count=rating_count):
+            self.rebuild(Title.objects.filter(pk=title_id))
+
+
+class LeaderboardEntry(models.Model):
+    """Место произведения в топе.
+
+    Общий топ — записи без категории и жанра, у произведения есть
+    по записи на общий топ, свою категорию и каждый свой жанр. В топы
+    попадают произведения хотя бы с LEADERBOARD_MIN_REVIEWS оценками.
+    """
+    title = models.ForeignKey(Title,
+                              on_delete=models.CASCADE,
+                              verbose_name='произведение')
+    # индекс по категории — начало составного индекса топа
+    category = models.ForeignKey(Category,
+                                 blank=True,
+                                 null=True,
+                                 on_delete=models.CASCADE,
+                                 db_index=False,
+                                 verbose_name='категория')
+    genre = models.ForeignKey(Genre,
+                              blank=True,
+                              null=True,
+                              on_delete=models.CASCADE,
+                              verbose_name='жанр')
+    rating = models.FloatField('средняя оценка')
+    rating_count = models.PositiveIntegerField('число оценок')
+
+    objects = LeaderboardQuerySet.as_manager()
+
+    class Meta:
+        default_related_name = 'leaderboard_entries'
+        indexes = [
+            # топ читается диапазоном индекса, без сортировки
+            models.Index(
+                fields=['category', 'genre', '-rating', '-rating_count',
+                        'title'],
+                name='leaderboard_top_idx',
+            ),
+        ]
+        verbose_name = 'место в топе'
+        verbose_name_plural = 'топы произведений'
+
+    def __str__(self):
+        return f'{self.title}: {self.rating:.2f}'
+
+    @classmethod
+    def for_title(cls, title, **scope):
+        return cls(title_id=title.pk,
+                   rating=title.rating_sum / title.rating_count,
+                   rating_count=title.rating_count,
+                   **scope)
+
+
+class TitleTrigramQuerySet(models.QuerySet):
+
+    def rebuild(self, titles):
+        """Пересоздаёт триграммы названий произведений из titles."""
+        self.filter(title__in=titles).delete()
+        self.bulk_create(
+            (TitleTrigram(title_id=title_id, trigram=trigram)
+             for title_id, name in (titles.order_by()
+                                    .values_list('pk', 'name').iterator())
+             for trigram in trigrams(name)),
+            batch_size=TRIGRAM_BATCH_SIZE,
+        )
+
+    def index_title(self, title, old_name=None):
+        """Переносит в индекс новое название произведения.
+
+        old_name — название, по которому построены текущие триграммы
+        ('' у нового произведения): меняются только отличающиеся
+        триграммы. Без него триграммы пересоздаются.
+        """
+        grams = trigrams(title.name)
+        with transaction.atomic(using=router.db_for_write(TitleTrigram)):
+            if old_name is None:
+                self.filter(title=title).delete()
+                added = grams
+            else:
+                old = trigrams(old_name)
+                if old - grams:
+                    self.filter(title=title,
+                                trigram__in=old - grams).delete()
+                added = grams - old
+            self.bulk_create(TitleTrigram(title_id=title.pk, trigram=trigram)
+                             for trigram in added)
+
+    def similar(self, query, limit):
+        """[(id, сходство)] произведений с похожими на query названиями.
+
+        Кандидаты — FUZZY_CANDIDATES произведений с наибольшим числом
+        общих с query триграмм, при равенстве — с более коротким
+        названием (у него выше сходство) — выбираются одним запросом
+        вместе с названиями, точное сходство считается в процессе.
+        """
+        grams = trigrams(query)
+        if not grams:
+            return []
+        candidates = (self.filter(trigram__in=grams)
+                      .values('title')
+                      .annotate(shared=Count('pk'))
+                      .order_by('-shared', Length('title__name'), 'title')
+                      .values('title')[:settings.FUZZY_CANDIDATES])
+        ranked = []
+        for pk, name in (Title.objects.filter(pk__in=candidates)
+                         .order_by().values_list('pk', 'name')):
+            score = similarity(grams, trigrams(name))
+            if score >= settings.FUZZY_THRESHOLD:
+                ranked.append((-score, pk))
+        ranked.sort()
+        return [(pk, -score) for score, pk in ranked[:limit]]
+
+
+class TitleTrigram(models.Model):
+    """Триграмма названия произведения для нечёткого поиска."""
+    title = models.ForeignKey(Title,
+                              on_delete=models.CASCADE,
+                              db_index=False,
+                              verbose_name='произведение')
+    trigram = models.CharField('триграмма', max_length=TRIGRAM_MAX_LENGTH)
+
+    objects = TitleTrigramQuerySet.as_manager()
+
+    class Meta:
+        default_related_name = 'trigrams'
+        indexes = [
+            # кандидаты читаются из индекса, без обращения к таблице
+            models.Index(fields=['trigram', 'title'],
+                         name='title_trigram_idx'),
+        ]
+        constraints = [
+            # заменяет индекс внешнего ключа title
+            models.UniqueConstraint(fields=['title', 'trigram'],
+                                    name='unique_title_trigram'),
+        ]
+        verbose_name = 'триграмма названия'
+        verbose_name_plural = 'триграммы названий'
+
+    def __str__(self):
+        return f'{self.title_id}: {self.trigram}'
@@ -0,0 +1,198 @@
+"""Полнотекстовый поиск на SQLite FTS5 и нечёткий поиск по триграммам."""
+import html
+import re
+import unicodedata
+
+from django.db import connections
+
+WORDS = re.compile(r'\w+')
+SNIPPET_START = '<b>'
+SNIPPET_END = '</b>'
+# метки выделения от FTS5: символы из области частного использования,
+# в HTML заменяются тегами уже после экранирования текста
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+SNIPPET_ELLIPSIS = '…'
+SNIPPET_TOKENS = 16
+# кириллица пишется латиницей: «Мастер» и «Master» дают одни триграммы
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+
+def match_expression(query):
+    """Запрос FTS5 из пользовательской строки: все слова, по префиксу.
+
+    Слова берутся в кавычки, так что операторы FTS5 (AND, NEAR,
+    звёздочки, скобки) в строке пользователя ничего не значат.
+    """
+    words = WORDS.findall(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def normalize(text):
+    """Текст для нечёткого поиска: нижний регистр, латиница, без диакритики."""
+    text = unicodedata.normalize('NFKD', text.casefold().translate(TRANSLIT))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def trigrams(text):
+    """Триграммы слов текста, как в pg_trgm: слово дополняется пробелами."""
+    grams = set()
+    for word in WORDS.findall(normalize(text)):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left, right):
+    """Сходство наборов триграмм: доля общих среди всех."""
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared) if shared else 0.0
+
+
+def highlight(text):
+    """Экранирует фрагмент для HTML и ставит теги вместо меток."""
+    return (html.escape(text)
+            .replace(MARK_START, SNIPPET_START)
+            .replace(MARK_END, SNIPPET_END))
+
+
+class FtsIndex:
+    """Таблица FTS5 над текстовыми колонками таблицы модели.
+
+    Таблица внешнего содержимого (content=): тексты в ней не дублируются,
+    хранится только индекс. Синхронизируется триггерами, поэтому видит и
+    записи в обход ORM: bulk_create, update, импорт.
+    """
+
+    def __init__(self, table, content_table, columns, weights):
+        self.table = table
+        self.content_table = content_table
+        self.columns = columns
+        self.weights = weights
+
+    def available(self, using):
+        return connections[using].vendor == 'sqlite'
+
+    def triggers_sql(self):
+        columns = ', '.join(self.columns)
+        new = ', '.join(f'new.{column}' for column in self.columns)
+        old = ', '.join(f'old.{column}' for column in self.columns)
+        insert = (f'INSERT INTO {self.table}(rowid, {columns}) '
+                  f'VALUES (new.id, {new});')
+        delete = (f"INSERT INTO {self.table}({self.table}, rowid, {columns}) "
+                  f"VALUES ('delete', old.id, {old});")
+        return [
+            f'CREATE TRIGGER IF NOT EXISTS {self.table}_insert '
+            f'AFTER INSERT ON {self.content_table} BEGIN {insert} END',
+            f'CREATE TRIGGER IF NOT EXISTS {self.table}_delete '
+            f'AFTER DELETE ON {self.content_table} BEGIN {delete} END',
+            f'CREATE TRIGGER IF NOT EXISTS {self.table}_update '
+            f'AFTER UPDATE OF {columns} ON {self.content_table} '
+            f'BEGIN {delete} {insert} END',
+        ]
+
+    def create(self, using):
+        """Создаёт таблицу и триггеры и индексирует уже имеющиеся строки."""
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5('
+                f'{", ".join(self.columns)}, '
+                f"content='{self.content_table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            for sql in self.triggers_sql():
+                cursor.execute(sql)
+            self.rebuild(cursor)
+
+    def rebuild(self, cursor):
+        cursor.execute(
+            f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')"
+        )
+
+    def drop(self, using):
+        with connections[using].cursor() as cursor:
+            for suffix in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {self.table}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def restore_triggers(self, using):
+        """Возвращает триггеры после пересоздания таблицы миграцией.
+
+        SQLite меняет схему таблицы, создавая её заново, и триггеры
+        старой таблицы при этом пропадают.
+        """
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                'AND name = %s', [self.table]
+            )
+            if cursor.fetchone() is None:
+                return
+            for sql in self.triggers_sql():
+                cursor.execute(sql)
+
+    def snippets(self, ids, query, using, column=0):
+        """Фрагменты текстов строк ids вокруг найденных слов: {id: текст}.
+
+        Текст экранирован для HTML, найденные слова выделены тегами
+        SNIPPET_START/SNIPPET_END. Фрагменты строятся отдельным
+        запросом для уже выбранной страницы: в запросе с сортировкой по
+        релевантности они считались бы для каждой найденной строки.
+        """
+        expression = match_expression(query)
+        if not ids or expression is None:
+            return {}
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({self.table}, {column}, %s, %s, %s, '
+                f'{SNIPPET_TOKENS}) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s '
+                f'AND rowid IN ({", ".join(["%s"] * len(ids))})',
+                [MARK_START, MARK_END, SNIPPET_ELLIPSIS, expression, *ids],
+            )
+            return {rowid: highlight(text)
+                    for rowid, text in cursor.fetchall()}
+
+    def search(self, queryset, query, rank='search_rank', select=None):
+        """Строки queryset, найденные по запросу, самые релевантные первыми.
+
+        Релевантность — bm25 с весами колонок, меньше значит лучше.
+        """
+        weights = ', '.join(str(weight) for weight in self.weights)
+        select = {rank: f'bm25({self.table}, {weights})', **(select or {})}
+        expression = match_expression(query)
+        if expression is None:
+            # колонки те же, чтобы пустой результат можно было объединять
+            return queryset.extra(select=select).none()
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = {self.content_table}.id',
+                   f'{self.table} MATCH %s'],
+            params=[expression],
+            select=select,
+            order_by=[rank, 'pk'],
+        )
+
+
+TITLE_INDEX = FtsIndex('reviews_title_fts', 'reviews_title',
+                       ('name', 'description'), weights=(10.0, 1.0))
+REVIEW_INDEX = FtsIndex('reviews_review_fts', 'reviews_review', ('text',),
+                        weights=(1.0,))
+COMMENT_INDEX = FtsIndex('reviews_comment_fts', 'reviews_comment', ('text',),
+                         weights=(1.0,))
+INDEXES = (TITLE_INDEX, REVIEW_INDEX, COMMENT_INDEX)
+
+
+def restore_triggers(sender, using, **kwargs):
+    """post_migrate: триггеры полнотекстовых индексов на месте."""
+    for index in INDEXES:
+        if index.available(using):
+            index.restore_triggers(using)
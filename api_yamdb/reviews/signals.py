@@ -0,0 +1,247 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import (Category, Comment, Genre, GenreTitle, LeaderboardEntry,
+                     Review, Title, TitleTrigram, User, deferred_ratings,
+                     remember_shown)
+
+# отправляется после массовой записи в обход save(), sender — модель;
+# pks — id записанных объектов, title_ids — id затронутых произведений,
+# None — затронуты любые
+bulk_changed = Signal()
+# ограничение на число параметров в одном запросе `pk__in`
+IN_QUERY_SIZE = 900
+
+
+def in_batches(queryset, lookup, ids):
+    """Выборка по `<lookup>__in` пачками по IN_QUERY_SIZE id;
+    ids=None — вся выборка."""
+    if ids is None:
+        yield queryset
+        return
+    ids = sorted(ids)
+    for start in range(0, len(ids), IN_QUERY_SIZE):
+        yield queryset.filter(
+            **{f'{lookup}__in': ids[start:start + IN_QUERY_SIZE]}
+        )
+
+
+def changed_titles(title_ids):
+    """Затронутые массовой записью произведения пачками для `pk__in`."""
+    return in_batches(Title.objects.all(), 'pk', title_ids)
+
+
+def change_rating(title_id, score, count):
+    """Прибавляет оценку к рейтингу и гистограмме оценок произведения
+    (count=-1 — вычитает)."""
+    if title_id is None or score is None:
+        return
+    Title.objects.filter(pk=title_id).update(
+        modified=timezone.now(),
+        rating_sum=F('rating_sum') + score * count,
+        rating_count=F('rating_count') + count,
+        **{f'score_{score}': F(f'score_{score}') + count},
+    )
+
+
+@receiver(pre_save, sender=Review)
+def load_rated_review(sender, instance, raw, **kwargs):
+    if raw or instance.pk is None or hasattr(instance, '_rated'):
+        return
+    # отзыв сохраняют без загрузки из базы — узнаём учтённую оценку
+    instance._rated = (Review.objects
+                       .filter(pk=instance.pk)
+                       .values_list('title_id', 'score')
+                       .first()) or (None, None)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    old_title_id, old_score = (
+        (None, None) if created else getattr(instance, '_rated', (None, None))
+    )
+    if (old_title_id, old_score) != (instance.title_id, instance.score):
+        change_rating(old_title_id, old_score, -1)
+        change_rating(instance.title_id, instance.score, 1)
+        for title_id in {old_title_id, instance.title_id} - {None}:
+            LeaderboardEntry.objects.refresh_title(title_id)
+    instance.remember_rating_state()
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    titles = deferred_ratings.get()
+    if titles is not None:
+        titles.add(instance.title_id)
+        return
+    change_rating(instance.title_id, instance.score, -1)
+    LeaderboardEntry.objects.refresh_title(instance.title_id)
+
+
+def touch_titles(titles):
+    """Меняет дату изменения произведений, чьё представление изменилось."""
+    titles.update(modified=timezone.now())
+
+
+@receiver(pre_delete, sender=Category)
+def touch_category_titles(sender, instance, **kwargs):
+    touch_titles(Title.objects.filter(category=instance))
+
+
+@receiver(pre_delete, sender=Genre)
+def touch_genre_titles(sender, instance, **kwargs):
+    touch_titles(Title.objects.filter(genre=instance))
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Genre)
+def load_shown_fields(sender, instance, raw, **kwargs):
+    if raw or instance.pk is None or hasattr(instance, '_shown'):
+        return
+    # объект сохраняют без загрузки из базы — узнаём показанные значения
+    instance._shown = (sender.objects.filter(pk=instance.pk)
+                       .values_list(*sender.SHOWN_FIELDS).first())
+
+
+def is_renamed(sender, instance):
+    """Изменились ли поля, показанные в представлениях других объектов."""
+    shown = getattr(instance, '_shown', None)
+    remember_shown(instance)
+    return shown is not None and shown != instance._shown
+
+
+@receiver(post_save, sender=User)
+def touch_author_texts(sender, instance, **kwargs):
+    if is_renamed(sender, instance):
+        now = timezone.now()
+        Review.objects.filter(author=instance).update(modified=now)
+        Comment.objects.filter(author=instance).update(modified=now)
+
+
+@receiver(post_save, sender=Category)
+def touch_renamed_category_titles(sender, instance, **kwargs):
+    if is_renamed(sender, instance):
+        touch_titles(Title.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Genre)
+def touch_renamed_genre_titles(sender, instance, **kwargs):
+    if is_renamed(sender, instance):
+        touch_titles(Title.objects.filter(genre=instance))
+
+
+@receiver(bulk_changed, sender=User)
+def touch_author_texts_on_bulk(sender, pks=None, **kwargs):
+    now = timezone.now()
+    for model in (Review, Comment):
+        for texts in in_batches(model.objects.all(), 'author', pks):
+            texts.update(modified=now)
+
+
+@receiver(bulk_changed, sender=Category)
+def touch_category_titles_on_bulk(sender, pks=None, **kwargs):
+    for titles in in_batches(Title.objects.all(), 'category', pks):
+        touch_titles(titles)
+
+
+@receiver(bulk_changed, sender=Genre)
+def touch_genre_titles_on_bulk(sender, pks=None, **kwargs):
+    for titles in in_batches(Title.objects.all(), 'genre', pks):
+        touch_titles(titles)
+
+
+@receiver(bulk_changed, sender=GenreTitle)
+def touch_linked_titles_on_bulk(sender, title_ids=None, **kwargs):
+    for titles in changed_titles(title_ids):
+        touch_titles(titles)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def touch_title_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    # удаление связей обрабатывает GenreTitleQuerySet.delete()
+    if action != 'post_add' or not pk_set:
+        return
+    if not reverse:
+        touch_titles(Title.objects.filter(pk=instance.pk))
+    else:
+        touch_titles(Title.objects.filter(pk__in=pk_set))
+
+
+@receiver(pre_save, sender=GenreTitle)
+def load_linked_title(sender, instance, raw, **kwargs):
+    if raw or instance.pk is None:
+        return
+    # связь правят в админке — узнаём прежнее произведение
+    instance._linked_title_id = (GenreTitle.objects
+                                 .filter(pk=instance.pk)
+                                 .values_list('title_id', flat=True)
+                                 .first())
+
+
+@receiver(post_save, sender=GenreTitle)
+def update_linked_titles(sender, instance, raw, **kwargs):
+    # связь записана в обход title.genre: админка, GenreTitle.objects.create()
+    if raw:
+        return
+    titles = Title.objects.filter(pk__in={
+        instance.title_id, getattr(instance, '_linked_title_id', None)
+    } - {None})
+    touch_titles(titles)
+    LeaderboardEntry.objects.rebuild(titles)
+    instance._linked_title_id = instance.title_id
+
+
+def is_ranked(title):
+    return title.rating_count >= settings.LEADERBOARD_MIN_REVIEWS
+
+
+@receiver(post_save, sender=Title)
+def update_leaderboard_category(sender, instance, created, raw, **kwargs):
+    # у произведений вне топов записей нет, переносить нечего
+    if raw or not is_ranked(instance):
+        return
+    if getattr(instance, '_ranked_category_id', None) != instance.category_id:
+        LeaderboardEntry.objects.set_category(instance)
+    instance._ranked_category_id = instance.category_id
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def update_leaderboard_genres(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    # удаление связей обрабатывает GenreTitleQuerySet.delete()
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        # жанру добавили произведения: редкий путь из админки
+        LeaderboardEntry.objects.rebuild(Title.objects.filter(pk__in=pk_set))
+    elif is_ranked(instance):
+        LeaderboardEntry.objects.add_genres(instance, pk_set)
+
+
+@receiver(bulk_changed, sender=Title)
+@receiver(bulk_changed, sender=GenreTitle)
+def rebuild_leaderboard_on_bulk(sender, title_ids=None, **kwargs):
+    for titles in changed_titles(title_ids):
+        LeaderboardEntry.objects.rebuild(titles)
+
+
+@receiver(post_save, sender=Title)
+def index_title_trigrams(sender, instance, created, **kwargs):
+    # триграммы зависят только от названия
+    old_name = '' if created else getattr(instance, '_indexed_name', None)
+    if old_name != instance.name:
+        TitleTrigram.objects.index_title(instance, old_name)
+    instance._indexed_name = instance.name
+
+
+@receiver(bulk_changed, sender=Title)
+def rebuild_trigrams_on_bulk(sender, title_ids=None, **kwargs):
+    for titles in changed_titles(title_ids):
+        TitleTrigram.objects.rebuild(titles)
@@ -0,0 +1,20 @@
+from django.core.cache import cache
+from django.test.utils import override_settings
+import pytest
+
+
+def pytest_configure(config):
+    # тесты идут в одном процессе, файловый кэш им не нужен; включается
+    # до миграций тестовой базы, которые тоже пишут в кэш
+    override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yamdb-tests',
+    }}).enable()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # база очищается между тестами, закэшированные ответы — нет
+    cache.clear()
+    yield
+    cache.clear()
@@ -0,0 +1,83 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Review, Title
+from tests.utils import create_single_review, create_titles
+
+
+def get_title(client, title_id):
+    response = client.get(f'/api/v1/titles/{title_id}/')
+    assert response.status_code == HTTPStatus.OK
+    return response.json()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08Rating:
+
+    def test_01_rating_follows_reviews(self, admin_client, user_client,
+                                       moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        assert get_title(admin_client, title_id)['rating'] is None
+
+        create_single_review(user_client, title_id, 'хорошо', 6)
+        response = create_single_review(moderator_client, title_id, 'так',
+                                        9)
+        assert get_title(admin_client, title_id)['rating'] == 7, (
+            'Проверьте, что рейтинг пересчитывается при создании отзыва.'
+        )
+
+        review_id = response.json()['id']
+        moderator_client.patch(
+            f'/api/v1/titles/{title_id}/reviews/{review_id}/',
+            data={'score': 2}
+        )
+        assert get_title(admin_client, title_id)['rating'] == 4, (
+            'Проверьте, что рейтинг пересчитывается при изменении оценки.'
+        )
+
+        moderator_client.delete(
+            f'/api/v1/titles/{title_id}/reviews/{review_id}/'
+        )
+        assert get_title(admin_client, title_id)['rating'] == 6, (
+            'Проверьте, что рейтинг пересчитывается при удалении отзыва.'
+        )
+
+    def test_02_rating_after_author_deleted(self, admin_client, user,
+                                            user_client, moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        create_single_review(user_client, title_id, 'плохо', 1)
+        create_single_review(moderator_client, title_id, 'отлично', 10)
+
+        user.delete()
+        title = Title.objects.get(pk=title_id)
+        assert (title.rating_sum, title.rating_count) == (10, 1), (
+            'Проверьте, что каскадное удаление отзывов вместе с автором '
+            'обновляет рейтинг произведения.'
+        )
+
+    def test_03_refresh_ratings(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        create_single_review(user_client, title_id, 'норм', 8)
+        Review.objects.update(score=3)
+        Title.objects.refresh_ratings()
+        assert get_title(admin_client, title_id)['rating'] == 3
+
+    def test_04_stale_title_save(self, admin_client, user):
+        titles, _, _ = create_titles(admin_client)
+        title = Title.objects.get(pk=titles[0]['id'])
+        Review.objects.create(title=title, author=user, text='хорошо',
+                              score=7)
+        title.name = 'Новое название'
+        title.save()
+        title = Title.objects.get(pk=title.pk)
+        assert (title.name, title.rating_sum, title.rating_count,
+                title.score_7) == ('Новое название', 7, 1, 1), (
+            'Проверьте, что сохранение произведения не затирает счётчики '
+            'оценок, изменённые после его загрузки.'
+        )
+        admin_client.patch(f'/api/v1/titles/{title.pk}/', data={'year': 1990})
+        assert get_title(admin_client, title.pk)['rating'] == 7
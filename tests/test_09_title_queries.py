@@ -0,0 +1,57 @@
+import pytest
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.fixture
+def many_titles():
+    categories = [
+        Category.objects.create(name=f'Категория {i}', slug=f'category-{i}')
+        for i in range(3)
+    ]
+    genres = [
+        Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+        for i in range(4)
+    ]
+    titles = []
+    for i in range(12):
+        title = Title.objects.create(
+            name=f'Произведение {i}', year=2000 + i,
+            description='описание', category=categories[i % 3]
+        )
+        title.genre.set(genres[i % 2:i % 2 + 3])
+        titles.append(title)
+    return titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09TitleQueries:
+
+    # count + страница произведений с категориями + жанры страницы
+    LIST_QUERIES = 3
+    DETAIL_QUERIES = 2
+
+    def test_01_list(self, client, many_titles,
+                     django_assert_num_queries):
+        for page in (1, 2, 3):
+            with django_assert_num_queries(self.LIST_QUERIES):
+                response = client.get(f'/api/v1/titles/?page={page}')
+            results = response.json()['results']
+            assert results and all(
+                title['category'] and title['genre'] for title in results
+            )
+
+    def test_02_detail(self, client, many_titles,
+                       django_assert_num_queries):
+        with django_assert_num_queries(self.DETAIL_QUERIES):
+            response = client.get(f'/api/v1/titles/{many_titles[0].id}/')
+        assert len(response.json()['genre']) == 3
+
+    @pytest.mark.parametrize('query', (
+        'genre=genre-1', 'category=category-2', 'name=Произв', 'year=2005',
+    ))
+    def test_03_filtered_list(self, client, many_titles, query,
+                              django_assert_num_queries):
+        with django_assert_num_queries(self.LIST_QUERIES):
+            response = client.get(f'/api/v1/titles/?{query}')
+        assert response.json()['results']
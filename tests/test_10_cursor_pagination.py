@@ -0,0 +1,85 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+
+from reviews.models import Comment, Review, Title
+
+
+def walk_cursor_pages(client, url):
+    """Проходит все страницы по ссылкам next, возвращает id объектов."""
+    ids = []
+    url = f'{url}?pagination=cursor'
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == 200
+        assert not any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ), f'Курсорная пагинация `{url}` не должна выполнять COUNT.'
+        data = response.json()
+        assert 'count' not in data
+        ids.extend(obj['id'] for obj in data['results'])
+        url = data['next']
+    return ids
+
+
+@pytest.fixture
+def title_with_reviews(django_user_model):
+    title = Title.objects.create(name='Тихий Дон', year=1940,
+                                 description='роман')
+    for i in range(10):
+        author = django_user_model.objects.create_user(
+            username=f'reader{i}', email=f'reader{i}@yamdb.fake'
+        )
+        review = Review.objects.create(title=title, author=author,
+                                       text=f'отзыв {i}', score=i + 1)
+        Comment.objects.create(review=review, author=author,
+                               text=f'комментарий {i}')
+    return title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10CursorPagination:
+
+    def test_01_reviews(self, client, title_with_reviews):
+        url = f'/api/v1/titles/{title_with_reviews.id}/reviews/'
+        ids = walk_cursor_pages(client, url)
+        assert ids == list(
+            title_with_reviews.reviews.order_by('pub_date', 'id')
+            .values_list('id', flat=True)
+        )
+
+    def test_02_comments(self, client, title_with_reviews):
+        review = title_with_reviews.reviews.first()
+        url = (f'/api/v1/titles/{title_with_reviews.id}/reviews/'
+               f'{review.id}/comments/')
+        assert walk_cursor_pages(client, url) == list(
+            review.comments.values_list('id', flat=True)
+        )
+
+    def test_03_titles_with_equal_names(self, client):
+        for i in range(9):
+            Title.objects.create(name=f'Сказка {i % 3}', year=1900 + i,
+                                 description='сказка')
+        ids = walk_cursor_pages(client, '/api/v1/titles/')
+        assert ids == list(
+            Title.objects.order_by('name', 'id').values_list('id', flat=True)
+        )
+
+    def test_04_page_number_by_default(self, client, title_with_reviews):
+        response = client.get(
+            f'/api/v1/titles/{title_with_reviews.id}/reviews/'
+        )
+        assert response.json()['count'] == 10
+
+    @pytest.mark.parametrize('query', ('q=дон', 'fuzzy=Тихй Дон'))
+    def test_05_ranked_search_rejects_cursor(self, client,
+                                             title_with_reviews, query):
+        response = client.get(f'/api/v1/titles/?{query}&pagination=cursor')
+        assert response.status_code == 400, (
+            'Проверьте, что курсорная пагинация с поиском по релевантности '
+            'отклоняется: курсор потерял бы порядок выдачи.'
+        )
+        assert 'pagination' in response.json()
+        response = client.get(f'/api/v1/titles/?{query}')
+        assert response.json()['results'][0]['id'] == title_with_reviews.id
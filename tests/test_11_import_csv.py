@@ -0,0 +1,306 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management import call_command
+import pytest
+
+from reviews import importer
+from reviews.models import (Comment, GenreTitle, LeaderboardEntry, Review,
+                            Title, TitleTrigram, User)
+from reviews.search import trigrams
+
+DATA_DIR = os.path.join(settings.BASE_DIR, 'static/data/')
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for name in os.listdir(DATA_DIR):
+        shutil.copy(os.path.join(DATA_DIR, name), tmp_path)
+    return tmp_path
+
+
+def import_csv(data_dir, *args):
+    out = io.StringIO()
+    call_command(
+        'import_csv', '--path', str(data_dir),
+        '--checkpoint', str(data_dir / 'checkpoint.json'),
+        '--reject-file', str(data_dir / 'rejects.csv'),
+        '--workers', '1', *args, stdout=out
+    )
+    return out.getvalue()
+
+
+def read_rejects(data_dir):
+    with open(data_dir / 'rejects.csv', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11ImportCsv:
+
+    def test_01_import_bundled_data(self, data_dir):
+        import_csv(data_dir, '--batch-size', '10')
+        assert User.objects.count() == 5
+        assert Title.objects.count() == 32
+        assert GenreTitle.objects.count() == 42
+        assert Comment.objects.count() == 3
+        review = Review.objects.get(pk=1)
+        assert review.pub_date.year == 2019, (
+            'Проверьте, что импорт сохраняет дату публикации из csv.'
+        )
+        title = Title.objects.get(pk=1)
+        assert title.rating_count == title.reviews.count(), (
+            'Проверьте, что после импорта отзывов пересчитывается рейтинг.'
+        )
+
+    def test_02_import_is_repeatable(self, data_dir):
+        import_csv(data_dir)
+        import_csv(data_dir)
+        assert Review.objects.count() == 72
+        assert Title.objects.get(pk=1).rating_count == 2
+
+    def test_03_missing_foreign_key(self, data_dir):
+        with open(data_dir / 'titles.csv', 'a', encoding='utf-8') as file:
+            file.write('\n999,Без категории,2000,42\n')
+        output = import_csv(data_dir)
+        assert Title.objects.count() == 32
+        assert Review.objects.count() == 72, (
+            'Проверьте, что строка со ссылкой на несуществующий объект '
+            'не прерывает импорт.'
+        )
+        assert 'отклонено строк: 1' in output
+        reject, = read_rejects(data_dir)
+        assert (reject['file'], reject['line']) == ('titles.csv', '34')
+        assert 'category_id=42' in reject['error']
+
+    def test_04_resume_gzip(self, data_dir):
+        with open(data_dir / 'review.csv', 'rb') as source:
+            with gzip.open(data_dir / 'review.csv.gz', 'wb') as target:
+                shutil.copyfileobj(source, target)
+        os.remove(data_dir / 'review.csv')
+        checkpoint = data_dir / 'checkpoint.json'
+        for table in ('users', 'category', 'genre', 'titles'):
+            import_csv(data_dir, '--table', table)
+        # импорт прервался после первых 30 отзывов
+        state = {table: {'rows': 0, 'done': True}
+                 for table in ('users', 'category', 'genre', 'titles',
+                               'genre_title', 'comments')}
+        state['review'] = {'rows': 30, 'done': False}
+        checkpoint.write_text(json.dumps(state))
+        import_csv(data_dir, '--resume', '--batch-size', '7')
+        assert Review.objects.count() == 72 - 30, (
+            'Проверьте, что импорт с --resume продолжает загрузку с '
+            'контрольной точки.'
+        )
+        with open(os.path.join(DATA_DIR, 'review.csv'),
+                  encoding='utf-8') as file:
+            skipped_ids = [row['id'] for row in csv.DictReader(file)][:30]
+        assert not Review.objects.filter(pk__in=skipped_ids).exists()
+        assert not GenreTitle.objects.exists()
+        assert not checkpoint.exists(), (
+            'Проверьте, что после успешного импорта контрольная точка '
+            'удаляется.'
+        )
+
+    def test_05_incremental(self, data_dir):
+        import_csv(data_dir)
+        titles = (data_dir / 'titles.csv').read_text(encoding='utf-8')
+        (data_dir / 'titles.csv').write_text(
+            titles.replace('2,Крестный отец,1972,1', '2,Крёстный отец,1972,2')
+            + '\n100,Новое произведение,2001,1',
+            encoding='utf-8'
+        )
+        output = import_csv(data_dir, '--incremental')
+        title = Title.objects.get(pk=2)
+        assert (title.name, title.category_id) == ('Крёстный отец', 2), (
+            'Проверьте, что в режиме --incremental изменившиеся строки '
+            'обновляются.'
+        )
+        assert Title.objects.filter(pk=100).exists()
+        assert ('произведения: добавлено 1, обновлено 1, '
+                'без изменений или пропущено 31') in output
+        assert 'отзывы: добавлено 0, обновлено 0' in output
+
+    def test_06_parallel_validation(self, data_dir):
+        with open(data_dir / 'users.csv', 'a', encoding='utf-8') as file:
+            file.write('\n200,me,me@yamdb.fake,user,,,\n'
+                       '201,bad name,bad@yamdb.fake,user,,,\n')
+        with open(data_dir / 'titles.csv', 'a', encoding='utf-8') as file:
+            file.write('\n300,Из будущего,3000,1\n')
+        reviews = (data_dir / 'review.csv').read_text(encoding='utf-8')
+        (data_dir / 'review.csv').write_text(
+            reviews + '\n500,1,"Оценка 11",100,11,2020-01-01T00:00:00Z\n',
+            encoding='utf-8'
+        )
+        output = import_csv(data_dir, '--workers', '2', '--batch-size', '5')
+        assert Review.objects.count() == 72
+        assert Title.objects.count() == 32
+        assert User.objects.count() == 5
+        assert 'отклонено строк: 4' in output
+        errors = {reject['row']: reject['error']
+                  for reject in read_rejects(data_dir)}
+        assert any('score' in error for error in errors.values()), (
+            'Проверьте, что оценка вне диапазона 1–10 отклоняется.'
+        )
+        assert any('year' in error for error in errors.values())
+        assert sum('username' in error for error in errors.values()) == 2
+
+    def test_07_unique_constraints(self, data_dir):
+        with open(data_dir / 'users.csv', 'a', encoding='utf-8') as file:
+            file.write('\n200,bingobongo,other@yamdb.fake,user,,,\n'
+                       '201,other,bingobongo@yamdb.fake,user,,,\n'
+                       '202,newcomer,newcomer@yamdb.fake,user,,,\n'
+                       '203,newcomer,newcomer2@yamdb.fake,user,,,\n')
+        reviews = (data_dir / 'review.csv').read_text(encoding='utf-8')
+        (data_dir / 'review.csv').write_text(
+            reviews + '\n500,1,"Второй отзыв",100,5,2020-01-01T00:00:00Z\n',
+            encoding='utf-8'
+        )
+        output = import_csv(data_dir, '--batch-size', '5')
+        assert User.objects.count() == 6, (
+            'Проверьте, что строки с повторяющимися именем или email '
+            'не прерывают импорт, а остальные строки пачки записываются.'
+        )
+        assert User.objects.filter(username='newcomer').exists()
+        assert Review.objects.count() == 72
+        assert 'отклонено строк: 4' in output
+        rejects = read_rejects(data_dir)
+        assert {(reject['file'], json.loads(reject['row'])['id'])
+                for reject in rejects} == {
+            ('users.csv', '200'), ('users.csv', '201'), ('users.csv', '203'),
+            ('review.csv', '500'),
+        }, 'Проверьте, что нарушающие уникальность строки отклоняются.'
+        assert all('UNIQUE' in reject['error'] for reject in rejects)
+
+    def test_08_gzip_file_closed(self, data_dir, monkeypatch):
+        with open(data_dir / 'genre.csv', 'rb') as source:
+            with gzip.open(data_dir / 'genre.csv.gz', 'wb') as target:
+                shutil.copyfileobj(source, target)
+        opened = []
+
+        def tracking_open(*args, **kwargs):
+            opened.append(open(*args, **kwargs))
+            return opened[-1]
+
+        monkeypatch.setattr(importer, 'open', tracking_open, raising=False)
+        with importer.open_csv(str(data_dir / 'genre.csv.gz')) as file:
+            assert next(csv.reader(file)) == ['id', 'name', 'slug']
+        assert opened and all(file.closed for file in opened), (
+            'Проверьте, что после чтения gzip закрывается и сам файл.'
+        )
+
+    def test_09_incremental_rebuilds_changed_titles(self, data_dir,
+                                                    settings):
+        settings.LEADERBOARD_MIN_REVIEWS = 1
+        import_csv(data_dir)
+
+        def derived_ids(title_id):
+            return (
+                set(TitleTrigram.objects.filter(title_id=title_id)
+                    .values_list('pk', flat=True)),
+                set(LeaderboardEntry.objects.filter(title_id=title_id)
+                    .values_list('pk', flat=True)),
+            )
+
+        untouched = derived_ids(1)
+        assert LeaderboardEntry.objects.filter(title_id=2, genre_id=1).exists()
+        titles = (data_dir / 'titles.csv').read_text(encoding='utf-8')
+        (data_dir / 'titles.csv').write_text(
+            titles.replace('2,Крестный отец,1972,1', '2,Крёстный отец,1972,1'),
+            encoding='utf-8'
+        )
+        links = (data_dir / 'genre_title.csv').read_text(encoding='utf-8')
+        (data_dir / 'genre_title.csv').write_text(
+            links.replace('\n2,2,1\n', '\n2,32,1\n'), encoding='utf-8'
+        )
+        import_csv(data_dir, '--incremental')
+        assert derived_ids(1) == untouched, (
+            'Проверьте, что инкрементальный импорт перестраивает триграммы '
+            'и топы только изменившихся произведений.'
+        )
+        assert set(TitleTrigram.objects.filter(title_id=2).values_list(
+            'trigram', flat=True
+        )) == trigrams('Крёстный отец')
+        genre_entries = set(LeaderboardEntry.objects.filter(
+            genre__isnull=False, title_id__in=(2, 32)
+        ).values_list('title_id', 'genre_id'))
+        assert (2, 1) not in genre_entries
+        assert ((32, 1) in genre_entries) == (
+            Title.objects.get(pk=32).rating_count > 0
+        )
+
+    def test_10_interrupted_rerun(self, data_dir, monkeypatch):
+        import_chunk = importer.Importer.import_chunk
+        calls = []
+
+        def interrupt(self, table, chunk, stats):
+            if table.model is Review and len(calls) == 2:
+                raise KeyboardInterrupt
+            if table.model is Review:
+                calls.append(table)
+            return import_chunk(self, table, chunk, stats)
+
+        monkeypatch.setattr(importer.Importer, 'import_chunk', interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            import_csv(data_dir, '--batch-size', '10')
+        counts = dict(Title.objects.values_list('pk', 'rating_count'))
+        assert Review.objects.exists() and all(
+            counts[title_id] == Review.objects.filter(
+                title_id=title_id).count() for title_id in counts
+        ), 'Проверьте, что записанные пачки отзывов сразу учтены в рейтинге.'
+        monkeypatch.undo()
+        import_csv(data_dir, '--batch-size', '10')
+        assert all(
+            title.rating_count == title.reviews.count()
+            for title in Title.objects.all()
+        ), (
+            'Проверьте, что повторный импорт после прерывания оставляет '
+            'верные рейтинги.'
+        )
+
+    def test_11_incremental_changes_etag(self, data_dir, client):
+        import_csv(data_dir)
+        url = '/api/v1/titles/1/'
+        etag = client.get(url)['ETag']
+        links = (data_dir / 'genre_title.csv').read_text(encoding='utf-8')
+        (data_dir / 'genre_title.csv').write_text(
+            links.replace('\n1,1,1\n', '\n1,1,2\n'), encoding='utf-8'
+        )
+        import_csv(data_dir, '--incremental')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что импорт жанров произведения меняет его ETag.'
+        )
+        etag = response['ETag']
+        categories = (data_dir / 'category.csv').read_text(encoding='utf-8')
+        (data_dir / 'category.csv').write_text(
+            categories.replace('1,Фильм,movie', '1,Кино,movie'),
+            encoding='utf-8'
+        )
+        import_csv(data_dir, '--incremental')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что импорт переименованной категории меняет ETag '
+            'её произведений.'
+        )
+        assert response.json()['category']['name'] == 'Кино'
+        review = Review.objects.select_related('author').first()
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+        etag = client.get(url)['ETag']
+        users = (data_dir / 'users.csv').read_text(encoding='utf-8')
+        (data_dir / 'users.csv').write_text(
+            users.replace(f',{review.author.username},',
+                          f',{review.author.username}_new,'),
+            encoding='utf-8'
+        )
+        import_csv(data_dir, '--incremental')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что импорт переименованного пользователя меняет '
+            'ETag его отзывов.'
+        )
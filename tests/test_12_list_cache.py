@@ -0,0 +1,111 @@
+from http import HTTPStatus
+import os
+import sqlite3
+import subprocess
+import sys
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import override_settings
+import pytest
+
+from api.cache import get_list_version
+from reviews.models import Genre
+from tests.utils import create_categories, create_genre
+
+
+@pytest.fixture
+def stale_replica(tmp_path, settings):
+    """Реплика — снимок основной базы, который не догоняет записи."""
+    def snapshot():
+        connection = sqlite3.connect(tmp_path / 'replica.sqlite3')
+        connections['default'].ensure_connection()
+        connections['default'].connection.backup(connection)
+        connection.close()
+
+    connections.settings['replica1'] = {
+        **connections['default'].settings_dict,
+        'NAME': str(tmp_path / 'replica.sqlite3'),
+    }
+    settings.DATABASE_REPLICAS = ['replica1']
+    yield snapshot
+    connections['replica1'].close()
+    del connections.settings['replica1']
+    del connections['replica1']
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12ListCache:
+
+    @pytest.mark.parametrize('url, create', (
+        ('/api/v1/categories/', create_categories),
+        ('/api/v1/genres/', create_genre),
+    ))
+    def test_01_cached_until_changed(self, client, admin_client, url,
+                                     create, django_assert_num_queries):
+        objects = create(admin_client)
+        first = client.get(url).json()
+        with django_assert_num_queries(0):
+            response = client.get(url)
+        assert response.json() == first, (
+            f'Проверьте, что повторный GET-запрос к `{url}` отдаётся из кэша.'
+        )
+
+        response = admin_client.post(url, data={'name': 'Новое',
+                                                'slug': 'new-slug'})
+        assert response.status_code == HTTPStatus.CREATED
+        assert client.get(url).json()['count'] == len(objects) + 1, (
+            f'Проверьте, что создание объекта через `{url}` сбрасывает кэш.'
+        )
+
+        admin_client.delete(f'{url}new-slug/')
+        assert client.get(url).json() == first, (
+            f'Проверьте, что удаление объекта через `{url}` сбрасывает кэш.'
+        )
+
+    def test_02_key_includes_query(self, client, admin_client):
+        create_genre(admin_client)
+        url = '/api/v1/genres/'
+        all_genres = client.get(url).json()
+        found = client.get(f'{url}?search=Драма').json()
+        assert found['count'] == 1
+        assert client.get(f'{url}?page=1').json() == all_genres
+        assert client.get(f'{url}?search=Драма').json() == found
+
+    def test_03_shared_between_processes(self, tmp_path):
+        from api_yamdb import settings as project_settings
+        assert 'locmem' not in project_settings.CACHES['default']['BACKEND'], (
+            'Проверьте, что по умолчанию кэш общий для процессов gunicorn: '
+            'иначе сброс кэша виден только одному процессу.'
+        )
+        script = (
+            'from api.cache import bump_list_version; '
+            'from reviews.models import Genre; '
+            'bump_list_version(Genre)'
+        )
+        backend = {'BACKEND': project_settings.CACHES['default']['BACKEND'],
+                   'LOCATION': str(tmp_path)}
+        with override_settings(CACHES={'default': backend}):
+            version = get_list_version(Genre)
+            subprocess.run(
+                [sys.executable, 'manage.py', 'shell', '-c', script],
+                cwd=settings.BASE_DIR, check=True,
+                env={**os.environ, 'CACHE_LOCATION': str(tmp_path)},
+            )
+            assert get_list_version(Genre) != version, (
+                'Проверьте, что сброс кэша в одном процессе виден другим.'
+            )
+
+    def test_04_miss_reads_primary(self, client, admin_client,
+                                   stale_replica):
+        create_genre(admin_client)
+        stale_replica()
+        url = '/api/v1/genres/'
+        assert client.get(url).json()['count'] == Genre.objects.count()
+        response = admin_client.post(url, data={'name': 'Новое',
+                                                'slug': 'new-slug'})
+        assert response.status_code == HTTPStatus.CREATED
+        assert client.get(url).json()['count'] == Genre.objects.count(), (
+            'Проверьте, что при промахе кэша список читается из основной '
+            'базы: иначе отставшая реплика попадёт в кэш под новой версией.'
+        )
@@ -0,0 +1,104 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Category, Genre
+from tests.utils import create_reviews, create_single_review, create_titles
+
+
+def assert_not_modified(client, url, etag):
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+        f'Проверьте, что GET-запрос к `{url}` с актуальным If-None-Match '
+        'возвращает ответ со статусом 304.'
+    )
+    assert response['ETag'] == etag
+    assert not response.content
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13ConditionalGet:
+
+    def test_01_title_detail(self, client, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[1]["id"]}/'
+        response = client.get(url)
+        etag = response['ETag']
+        assert etag.startswith('"') and response['Last-Modified']
+        assert_not_modified(client, url, etag)
+        response = client.get(url,
+                              HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+        create_single_review(user_client, titles[1]['id'], 'ещё отзыв', 3)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что новый отзыв меняет ETag произведения: '
+            'у него изменился рейтинг.'
+        )
+        assert response.json()['rating'] == 3
+        assert response['ETag'] != etag
+
+    def test_02_review_list(self, client, admin_client, admin, user,
+                            user_client):
+        reviews, titles = create_reviews(admin_client,
+                                         {admin: admin_client,
+                                          user: user_client})
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        etag = client.get(url)['ETag']
+        assert_not_modified(client, url, etag)
+        assert client.get(f'{url}?page=1')['ETag'] != etag
+
+        user_client.patch(f'{url}{reviews[1]["id"]}/', data={'score': 1})
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что изменение отзыва меняет ETag списка `{url}`.'
+        )
+        etag = response['ETag']
+        user_client.delete(f'{url}{reviews[1]["id"]}/')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['count'] == 1
+
+    def test_03_no_serialization_on_match(self, client, admin_client,
+                                          django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        etag = client.get(url)['ETag']
+        # произведение с категорией и его жанры, без подсчёта рейтинга
+        with django_assert_num_queries(2):
+            assert_not_modified(client, url, etag)
+
+    def test_04_related_rename(self, client, admin_client, admin, user,
+                               user_client):
+        reviews, titles = create_reviews(admin_client,
+                                         {admin: admin_client,
+                                          user: user_client})
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        etag = client.get(url)['ETag']
+        user_client.patch('/api/v1/users/me/', data={'username': 'renamed'})
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что смена имени пользователя меняет ETag '
+            'его отзывов.'
+        )
+        assert 'renamed' in {review['author']
+                             for review in response.json()['results']}
+
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        etag = client.get(url)['ETag']
+        category = Category.objects.get(slug=titles[0]['category'])
+        category.name = 'Новое имя'
+        category.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что переименование категории меняет ETag '
+            'её произведений.'
+        )
+        etag = response['ETag']
+        genre = Genre.objects.get(slug=titles[0]['genre'][0])
+        genre.name = 'Новый жанр'
+        genre.save()
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == (
+            HTTPStatus.OK
+        )
@@ -0,0 +1,38 @@
+import logging
+
+import pytest
+
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14SqlInstrumentation:
+
+    def test_01_headers(self, client, admin_client,
+                        django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        with django_assert_num_queries(2):
+            response = client.get(url)
+        assert response['X-DB-Queries'] == '2', (
+            'Проверьте, что заголовок X-DB-Queries содержит число '
+            'SQL-запросов.'
+        )
+        assert response['Server-Timing'].startswith('db;dur=')
+        assert 'desc="2 queries"' in response['Server-Timing']
+        assert 'total;dur=' in response['Server-Timing']
+
+    def test_02_over_budget_logged(self, client, admin_client, settings,
+                                   caplog):
+        create_titles(admin_client)
+        settings.REQUEST_QUERY_BUDGET = 1
+        with caplog.at_level(logging.WARNING, logger='api.sql'):
+            client.get('/api/v1/titles/')
+            client.get('/api/v1/categories/?search=nothing')
+        record, = [record for record in caplog.records
+                   if 'titles' in record.getMessage()]
+        message = record.getMessage()
+        assert 'GET /api/v1/titles/' in message
+        assert 'FROM "reviews_title"' in message, (
+            'Проверьте, что в лог попадает SQL запросов сверх бюджета.'
+        )
@@ -0,0 +1,65 @@
+import io
+import json
+
+from django.core.management import call_command
+from django.db.models import Count
+import pytest
+
+from reviews.models import Comment, Genre, Review, Title, User
+
+
+def generate_data(*args):
+    call_command(
+        'generate_data', '--users', '20', '--categories', '3',
+        '--genres', '5', '--titles', '30', '--reviews', '200',
+        '--comments', '100', '--seed', '1', *args, stdout=io.StringIO()
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15Benchmark:
+
+    def test_01_generate_data(self):
+        generate_data()
+        assert User.objects.count() == 20
+        assert Genre.objects.count() == 5
+        assert Title.objects.count() == 30
+        assert Review.objects.count() == 200, (
+            'Проверьте, что генератор создаёт заданное число отзывов.'
+        )
+        assert Comment.objects.count() == 100
+        counts = sorted(
+            Title.objects.annotate(count=Count('reviews'))
+            .values_list('count', flat=True), reverse=True
+        )
+        assert counts[0] >= 4 * counts[len(counts) // 2], (
+            'Проверьте, что отзывы распределены по произведениям '
+            'неравномерно.'
+        )
+        title = Title.objects.order_by('-rating_count').first()
+        assert title.rating_count == counts[0], (
+            'Проверьте, что после генерации пересчитывается рейтинг.'
+        )
+
+    def test_02_generate_data_twice(self):
+        generate_data()
+        generate_data()
+        assert Title.objects.count() == 60
+        assert Review.objects.count() == 400
+
+    def test_03_benchmark(self, tmp_path):
+        generate_data()
+        out = io.StringIO()
+        for _ in range(2):
+            call_command('benchmark', '--repeat', '2',
+                         '--output-dir', str(tmp_path), stdout=out)
+        first, second = sorted(tmp_path.glob('benchmark-*.json'))
+        report = json.loads(second.read_text(encoding='utf-8'))
+        result = report['results']['api']['reviews']
+        assert {'p50', 'p95', 'p99', 'queries'} <= set(result), (
+            'Проверьте, что benchmark сохраняет перцентили задержки и '
+            'число запросов.'
+        )
+        assert result['status'] == [200]
+        assert f'Сравнение с {first}' in out.getvalue()
+        assert 'api.reviews: p95' in out.getvalue()
@@ -0,0 +1,184 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from api.urls import router_v1
+from reviews.models import Category, Comment, Genre, Review, Title, User
+
+GENRES = ['genre-0', 'genre-1', 'genre-2']
+# имя маршрута, метод, url, клиент, данные, бюджет запросов
+CASES = (
+    ('api-root', 'get', '/api/v1/', 'client', None, 0),
+    ('categories-list', 'get', '/api/v1/categories/', 'client', None, 2),
+    ('categories-list', 'post', '/api/v1/categories/', 'admin_client',
+     {'name': 'Новая', 'slug': 'new'}, 3),
+    ('categories-detail', 'delete', '/api/v1/categories/{category}/',
+     'admin_client', None, 8),
+    ('genres-list', 'get', '/api/v1/genres/', 'client', None, 2),
+    ('genres-list', 'post', '/api/v1/genres/', 'admin_client',
+     {'name': 'Новый', 'slug': 'new'}, 3),
+    ('genres-detail', 'delete', '/api/v1/genres/{genre}/',
+     'admin_client', None, 7),
+    ('titles-list', 'get', '/api/v1/titles/', 'client', None, 3),
+    ('titles-list', 'get', '/api/v1/titles/?pagination=cursor', 'client',
+     None, 2),
+    ('titles-list', 'get', '/api/v1/titles/?genre={genre}', 'client',
+     None, 3),
+    ('titles-list', 'post', '/api/v1/titles/', 'admin_client',
+     {'name': 'Новое', 'year': 2000, 'description': 'Описание',
+      'category': '{category}', 'genre': GENRES}, 12),
+    ('titles-detail', 'get', '/api/v1/titles/{title}/', 'client', None, 2),
+    ('titles-detail', 'patch', '/api/v1/titles/{title}/', 'admin_client',
+     {'name': 'Другое', 'genre': GENRES[:2]}, 14),
+    ('titles-detail', 'delete', '/api/v1/titles/{title}/', 'admin_client',
+     None, 12),
+    ('titles-top', 'get', '/api/v1/titles/top/', 'client', None, 2),
+    ('titles-top', 'get', '/api/v1/titles/top/?genre={genre}', 'client',
+     None, 3),
+    ('search-list', 'get', '/api/v1/search/?q=Отзыв&title={title}',
+     'client', None, 4),
+    # индекс названий строится при первом запросе
+    ('titles-autocomplete', 'get', '/api/v1/titles/autocomplete/?prefix=П',
+     'client', None, 1),
+    ('user-list', 'get', '/api/v1/users/', 'admin_client', None, 3),
+    ('user-list', 'post', '/api/v1/users/', 'admin_client',
+     {'username': 'new', 'email': 'new@yamdb.fake'}, 5),
+    ('user-detail', 'get', '/api/v1/users/{username}/', 'admin_client',
+     None, 2),
+    ('user-detail', 'patch', '/api/v1/users/{username}/', 'admin_client',
+     {'bio': 'био'}, 4),
+    ('user-detail', 'delete', '/api/v1/users/{username}/', 'admin_client',
+     None, 16),
+    ('user-users-profile', 'get', '/api/v1/users/me/', 'user_client', None, 4),
+    ('user-users-profile', 'patch', '/api/v1/users/me/', 'user_client',
+     {'bio': 'био'}, 4),
+    ('reviews-list', 'get', '/api/v1/titles/{title}/reviews/', 'client',
+     None, 3),
+    ('reviews-list', 'get',
+     '/api/v1/titles/{title}/reviews/?pagination=cursor', 'client', None, 2),
+    ('reviews-list', 'post', '/api/v1/titles/{title}/reviews/',
+     'user_client', {'text': 'Отзыв', 'score': 5}, 9),
+    ('reviews-detail', 'get', '/api/v1/titles/{title}/reviews/{review}/',
+     'client', None, 2),
+    ('reviews-detail', 'patch', '/api/v1/titles/{title}/reviews/{review}/',
+     'admin_client', {'score': 1}, 7),
+    ('reviews-detail', 'delete', '/api/v1/titles/{title}/reviews/{review}/',
+     'admin_client', None, 9),
+    ('comments-list', 'get',
+     '/api/v1/titles/{title}/reviews/{review}/comments/', 'client', None, 3),
+    ('comments-list', 'get',
+     '/api/v1/titles/{title}/reviews/{review}/comments/?pagination=cursor',
+     'client', None, 2),
+    ('comments-list', 'post',
+     '/api/v1/titles/{title}/reviews/{review}/comments/', 'user_client',
+     {'text': 'Комментарий'}, 3),
+    ('comments-detail', 'get',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+     'client', None, 2),
+    ('comments-detail', 'patch',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+     'admin_client', {'text': 'Другой'}, 4),
+    ('comments-detail', 'delete',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+     'admin_client', None, 4),
+    ('signup', 'post', '/api/v1/auth/signup/', 'client',
+     {'username': 'newcomer', 'email': 'newcomer@yamdb.fake'}, 6),
+    ('token', 'post', '/api/v1/auth/token/', 'client',
+     {'username': '{username}', 'confirmation_code': 'wrong'}, 1),
+)
+PAGE_SIZES = (2, 8)
+ROWS = 12
+# неверный код подтверждения: запрос доходит до проверки кода
+EXPECTED_STATUS = {'token': 400}
+
+
+@pytest.fixture
+def data(admin):
+    category = Category.objects.create(name='Категория', slug='category')
+    genres = [Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+              for i in range(3)]
+    authors = [User.objects.create(username=f'author{i}',
+                                   email=f'author{i}@yamdb.fake')
+               for i in range(ROWS)]
+    titles = []
+    for i in range(ROWS):
+        title = Title.objects.create(name=f'Произведение {i}', year=2000,
+                                     category=category)
+        title.genre.set(genres)
+        titles.append(title)
+    reviews = [Review.objects.create(title=titles[0], author=author,
+                                     text='Отзыв', score=i % 10 + 1)
+               for i, author in enumerate(authors)]
+    # у автора отзывы на многие произведения: удаление не должно
+    # пересчитывать рейтинг по запросу на каждый отзыв
+    for title in titles[1:]:
+        Review.objects.create(title=title, author=authors[0], text='Отзыв',
+                              score=5)
+    comments = [Comment.objects.create(review=reviews[0], author=author,
+                                       text='Комментарий')
+                for author in authors]
+    return {
+        'category': category.slug,
+        'genre': genres[0].slug,
+        'title': titles[0].pk,
+        'review': reviews[0].pk,
+        'comment': comments[0].pk,
+        'username': authors[0].username,
+    }
+
+
+def fill(value, data):
+    if isinstance(value, str):
+        return value.format(**data)
+    if isinstance(value, list):
+        return [fill(item, data) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, data) for key, item in value.items()}
+    return value
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16QueryBudget:
+
+    @pytest.mark.parametrize('page_size', PAGE_SIZES)
+    @pytest.mark.parametrize(
+        'name, method, url, client_name, payload, budget', CASES,
+        ids=[f'{case[1]} {case[2]}' for case in CASES]
+    )
+    def test_01_budget(self, request, monkeypatch, data, page_size, name,
+                       method, url, client_name, payload, budget):
+        monkeypatch.setattr(PageNumberPagination, 'page_size', page_size)
+        monkeypatch.setattr(CursorPagination, 'page_size', page_size)
+        client = request.getfixturevalue(client_name)
+        url = fill(url, data)
+        kwargs = {}
+        if payload is not None:
+            kwargs = {'data': fill(payload, data)}
+            if client_name == 'client':
+                kwargs['content_type'] = 'application/json'
+            else:
+                kwargs['format'] = 'json'
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(url, **kwargs)
+        request_line = f'{method.upper()} {url}'
+        if name in EXPECTED_STATUS:
+            assert response.status_code == EXPECTED_STATUS[name]
+        else:
+            assert response.status_code < 300, (
+                f'{request_line} вернул {response.status_code}'
+            )
+        if len(context) > budget:
+            queries = '\n'.join(query['sql'] for query in context)
+            pytest.fail(
+                f'{request_line} выполняет {len(context)} SQL-запросов '
+                f'при бюджете {budget}:\n{queries}'
+            )
+
+    def test_02_all_routes_covered(self):
+        names = {pattern.name for pattern in router_v1.urls}
+        covered = {case[0] for case in CASES}
+        assert names <= covered, (
+            'Добавьте бюджет запросов для маршрутов: '
+            f'{", ".join(sorted(names - covered))}'
+        )
@@ -0,0 +1,61 @@
+import os
+import pstats
+
+import pytest
+
+from tests.utils import create_titles
+
+
+@pytest.fixture
+def profile_dir(settings, tmp_path):
+    settings.PROFILE_DIR = str(tmp_path / 'profiles')
+    return tmp_path / 'profiles'
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17Profiling:
+
+    def test_01_admin_profile(self, admin_client, profile_dir):
+        titles, _, _ = create_titles(admin_client)
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/',
+                                    HTTP_X_PROFILE='1')
+        assert response.status_code == 200
+        name = response.get('X-Profile')
+        assert name and (profile_dir / name).exists(), (
+            'Проверьте, что для администратора с заголовком X-Profile '
+            'сохраняется дамп cProfile и его имя возвращается в ответе.'
+        )
+        stats = pstats.Stats(str(profile_dir / name))
+        assert any(function[2] == 'retrieve' for function in stats.stats)
+        sql = (profile_dir / name.replace('.prof', '.sql')).read_text(
+            encoding='utf-8'
+        )
+        assert 'FROM "reviews_title"' in sql, (
+            'Проверьте, что рядом с дампом сохраняется журнал SQL.'
+        )
+
+    def test_02_not_admin(self, client, user_client, admin_client,
+                          profile_dir):
+        create_titles(admin_client)
+        for api_client in (client, user_client):
+            response = api_client.get('/api/v1/titles/', HTTP_X_PROFILE='1')
+            assert response.status_code == 200
+            assert 'X-Profile' not in response, (
+                'Проверьте, что профилирование доступно только '
+                'администраторам.'
+            )
+        response = client.get('/api/v1/titles/', HTTP_X_PROFILE='1',
+                              HTTP_AUTHORIZATION='Bearer broken')
+        assert 'X-Profile' not in response
+        assert not profile_dir.exists()
+
+    def test_03_retention(self, admin_client, settings, profile_dir):
+        settings.PROFILE_RETENTION = 2
+        names = [
+            admin_client.get('/api/v1/titles/', HTTP_X_PROFILE='1')
+            ['X-Profile'] for _ in range(3)
+        ]
+        assert sorted(os.listdir(profile_dir)) == sorted(
+            names[1:]
+            + [name.replace('.prof', '.sql') for name in names[1:]]
+        ), 'Проверьте, что хранятся только последние PROFILE_RETENTION дампов.'
@@ -0,0 +1,72 @@
+import io
+import json
+
+from django.core.management import call_command
+import pytest
+
+from api.slow_queries import fingerprint
+from tests.utils import create_titles
+
+
+@pytest.fixture
+def slow_log(settings, tmp_path):
+    settings.SLOW_QUERY_MS = 0
+    settings.SLOW_QUERY_LOG = str(tmp_path / 'slow.jsonl')
+    return tmp_path / 'slow.jsonl'
+
+
+def read_entries(path):
+    return [json.loads(line)
+            for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18SlowQueries:
+
+    def test_01_fingerprint(self):
+        assert fingerprint(
+            'SELECT * FROM t WHERE id IN (%s, %s,\n %s) AND name = %s'
+        ) == fingerprint('SELECT * FROM t WHERE id IN (%s) AND name = %s')
+        assert fingerprint("SELECT 1 FROM t WHERE a = 'x' LIMIT 21") == (
+            'SELECT %s FROM t WHERE a = %s LIMIT %s'
+        )
+
+    def test_02_log_entry(self, client, admin_client, slow_log):
+        create_titles(admin_client)
+        slow_log.unlink()
+        client.get('/api/v1/titles/?genre=drama')
+        entries = read_entries(slow_log)
+        entry, = [entry for entry in entries
+                  if 'reviews_genretitle' in entry['sql']
+                  and 'COUNT' in entry['sql']]
+        assert entry['view'] == 'api.views.TitleViewSet', (
+            'Проверьте, что в журнал записывается вызвавшее запрос '
+            'представление.'
+        )
+        assert entry['path'] == '/api/v1/titles/?genre=drama'
+        assert 'drama' in entry['params']
+        assert entry['plan'] and any(
+            'reviews_title' in row for row in entry['plan']
+        ), 'Проверьте, что для медленного запроса сохраняется план EXPLAIN.'
+
+    def test_03_threshold(self, client, settings, slow_log):
+        settings.SLOW_QUERY_MS = 10 ** 6
+        client.get('/api/v1/titles/')
+        assert not slow_log.exists()
+
+    def test_04_command(self, client, admin_client, slow_log):
+        create_titles(admin_client)
+        slow_log.unlink()
+        for slug in ('drama', 'comedy', 'rock'):
+            client.get(f'/api/v1/titles/?genre={slug}')
+        out = io.StringIO()
+        call_command('slow_queries', '--view', 'TitleViewSet', '--clear',
+                     stdout=out)
+        output = out.getvalue()
+        assert '3 раз' in output, (
+            'Проверьте, что slow_queries объединяет запросы с одинаковым '
+            'отпечатком.'
+        )
+        assert 'представления: api.views.TitleViewSet' in output
+        assert 'план:' in output
+        assert not slow_log.exists()
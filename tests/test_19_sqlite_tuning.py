@@ -0,0 +1,79 @@
+from django.db import OperationalError, connection, transaction
+from django.db.utils import ConnectionHandler
+import pytest
+
+from api_yamdb.db import retry_locked
+
+
+@pytest.fixture
+def file_connection(tmp_path, django_db_blocker):
+    handler = ConnectionHandler({'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(tmp_path / 'db.sqlite3'),
+    }})
+    with django_db_blocker.unblock():
+        yield handler['default']
+        handler['default'].close()
+
+
+class Locked:
+    """execute, который первые `failures` раз находит базу занятой."""
+
+    def __init__(self, failures, message='database is locked'):
+        self.failures = failures
+        self.message = message
+        self.calls = 0
+
+    def __call__(self, sql, params, many, context):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OperationalError(self.message)
+        return 'ok'
+
+
+class Test19SqliteTuning:
+
+    def test_01_pragmas(self, file_connection, settings):
+        settings.SQLITE_PRAGMAS = {**settings.SQLITE_PRAGMAS,
+                                   'mmap_size': 1024 * 1024}
+        file_connection.ensure_connection()
+        raw = file_connection.connection
+        assert raw.execute('PRAGMA journal_mode').fetchone() == ('wal',), (
+            'Проверьте, что новое соединение с SQLite переводится в WAL.'
+        )
+        assert raw.execute('PRAGMA synchronous').fetchone() == (1,)
+        assert raw.execute('PRAGMA mmap_size').fetchone() == (1024 * 1024,)
+        file_connection.close()
+        file_connection.ensure_connection()
+        assert file_connection.execute_wrappers.count(retry_locked) == 1, (
+            'Проверьте, что повтор запросов подключается к соединению '
+            'один раз.'
+        )
+
+    def test_02_retry_locked(self, settings):
+        settings.SQLITE_RETRY_DELAY = 0
+        execute = Locked(failures=2)
+        context = {'connection': connection}
+        assert retry_locked(execute, 'SELECT 1', (), False, context) == 'ok'
+        assert execute.calls == 3, (
+            'Проверьте, что запрос повторяется, пока база занята.'
+        )
+        execute = Locked(failures=settings.SQLITE_RETRIES + 1)
+        with pytest.raises(OperationalError):
+            retry_locked(execute, 'SELECT 1', (), False, context)
+        execute = Locked(failures=1, message='no such table: nothing')
+        with pytest.raises(OperationalError):
+            retry_locked(execute, 'SELECT 1', (), False, context)
+        assert execute.calls == 1
+
+    @pytest.mark.django_db
+    def test_03_no_retry_in_transaction(self, settings):
+        settings.SQLITE_RETRY_DELAY = 0
+        execute = Locked(failures=1)
+        with transaction.atomic():
+            with pytest.raises(OperationalError):
+                retry_locked(execute, 'SELECT 1', (), False,
+                             {'connection': connection})
+        assert execute.calls == 1, (
+            'Проверьте, что внутри транзакции запрос не повторяется.'
+        )
@@ -0,0 +1,111 @@
+import sqlite3
+
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory
+import pytest
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.middleware import ReplicaMiddleware
+from api_yamdb.db import replicate
+from api_yamdb.routers import read_from_replica
+from reviews.models import Review, Title, User
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ['replica1']
+    return settings.DATABASE_REPLICAS
+
+
+def auth(user_id):
+    return {'HTTP_AUTHORIZATION':
+            f'Bearer {AccessToken.for_user(User(id=user_id))}'}
+
+
+class RecordRoute:
+    """Представление-заглушка, запоминающее базу для чтения отзывов."""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.databases = []
+
+    def __call__(self, request):
+        self.databases.append(router.db_for_read(Review))
+        return HttpResponse(status=self.status)
+
+
+def route(method, path, status=200, **headers):
+    view = RecordRoute(status)
+    request = getattr(RequestFactory(), method)(path, **headers)
+    ReplicaMiddleware(view)(request)
+    return view.databases[0]
+
+
+class Test20ReplicaRouter:
+
+    def test_01_router(self, replicas):
+        assert router.db_for_read(Title) == 'default'
+        with read_from_replica():
+            assert router.db_for_read(Title) == 'replica1', (
+                'Проверьте, что при разрешённом чтении из реплик '
+                'произведения читаются из реплики.'
+            )
+            assert router.db_for_read(User) == 'default', (
+                'Проверьте, что пользователи всегда читаются из основной '
+                'базы.'
+            )
+            assert router.db_for_write(Title) == 'default'
+
+    def test_02_no_replicas(self, settings):
+        settings.DATABASE_REPLICAS = []
+        with read_from_replica():
+            assert router.db_for_read(Title) == 'default'
+        assert route('get', '/api/v1/titles/') == 'default'
+
+    def test_03_middleware(self, replicas):
+        assert route('get', '/api/v1/titles/') == 'replica1', (
+            'Проверьте, что безопасные запросы к API читают из реплики.'
+        )
+        assert route('get', '/api/v1/titles/1/reviews/',
+                     HTTP_AUTHORIZATION='Bearer broken') == 'replica1'
+        assert route('post', '/api/v1/titles/1/reviews/') == 'default', (
+            'Проверьте, что запросы на запись читают из основной базы.'
+        )
+        assert route('get', '/admin/') == 'default'
+
+    def test_04_read_your_writes(self, replicas, settings):
+        route('post', '/api/v1/titles/1/reviews/', status=201, **auth(1))
+        assert route('get', '/api/v1/titles/1/reviews/',
+                     **auth(1)) == 'default', (
+            'Проверьте, что после записи пользователь читает из основной '
+            'базы и видит свои изменения.'
+        )
+        assert route('get', '/api/v1/titles/1/reviews/',
+                     **auth(2)) == 'replica1'
+        assert route('get', '/api/v1/titles/1/reviews/') == 'replica1'
+        route('post', '/api/v1/titles/1/reviews/', status=400, **auth(3))
+        assert route('get', '/api/v1/titles/', **auth(3)) == 'replica1', (
+            'Проверьте, что неудачная запись не привязывает пользователя к '
+            'основной базе.'
+        )
+        settings.REPLICA_STICKY_SECONDS = 0
+        route('patch', '/api/v1/users/me/', **auth(4))
+        assert route('get', '/api/v1/titles/', **auth(4)) == 'replica1'
+
+    def test_05_replicate(self, tmp_path):
+        source = str(tmp_path / 'primary.sqlite3')
+        target = str(tmp_path / 'replica.sqlite3')
+        with sqlite3.connect(source) as connection:
+            connection.execute('CREATE TABLE t (value TEXT)')
+            connection.execute("INSERT INTO t VALUES ('первая')")
+        replicate(source, target)
+        with sqlite3.connect(source) as connection:
+            connection.execute("INSERT INTO t VALUES ('вторая')")
+        with sqlite3.connect(target) as connection:
+            assert connection.execute('SELECT value FROM t').fetchall() == [
+                ('первая',)
+            ]
+        replicate(source, target)
+        with sqlite3.connect(target) as connection:
+            assert len(connection.execute('SELECT * FROM t').fetchall()) == 2
@@ -0,0 +1,84 @@
+from django.db import connection
+import pytest
+
+from api.benchmark import indexes_scenario
+from api.middleware import QueryCollector, collect_queries
+from reviews.models import Comment, Review, Title, User
+
+
+@pytest.fixture
+def review():
+    author = User.objects.create(username='author', email='a@yamdb.fake')
+    title = Title.objects.create(name='Мост', year=1990, description='')
+    review = Review.objects.create(author=author, title=title, text='отзыв',
+                                   score=7)
+    Comment.objects.create(author=author, review=review, text='коммент')
+    return review
+
+
+def check_index(plan, index):
+    assert index in plan, (
+        f'Проверьте, что запрос использует индекс {index}. План:\n{plan}'
+    )
+    assert 'TEMP B-TREE' not in plan, (
+        f'Проверьте, что сортировка идёт по индексу, без временного '
+        f'дерева. План:\n{plan}'
+    )
+
+
+@pytest.mark.django_db
+class Test21Indexes:
+
+    def test_01_reviews(self, review):
+        reviews = review.title.reviews.select_related('author')
+        check_index(reviews.explain(), 'review_title_pub_date_idx')
+        check_index(reviews.order_by('pub_date', 'id')[:10].explain(),
+                    'review_title_pub_date_idx')
+
+    def test_02_comments(self, review):
+        comments = review.comments.select_related('author')
+        check_index(comments.explain(), 'comment_review_pub_date_idx')
+
+    def test_03_rating(self, review):
+        collector = QueryCollector()
+        with collect_queries(collector):
+            Title.objects.filter(pk=review.title_id).refresh_ratings()
+        query, = [query for query in collector.queries
+                  if query.sql.startswith('UPDATE "reviews_title"')]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + query.sql, query.params)
+            rows = [row[-1] for row in cursor.fetchall()]
+        assert ('SEARCH U0 USING COVERING INDEX review_title_score_idx '
+                '(title_id=?)') in rows, (
+            'Проверьте, что пересчёт рейтинга читает оценки только из '
+            f'индекса. План:\n{rows}'
+        )
+
+    def test_04_author_title(self, review):
+        # уникальное ограничение unique_review уже создаёт этот индекс
+        plan = Review.objects.filter(
+            author=review.author, title=review.title
+        ).explain()
+        assert '(author_id=? AND title_id=?)' in plan, (
+            'Проверьте, что поиск отзыва автора на произведение идёт по '
+            f'индексу уникальности. План:\n{plan}'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_05_benchmark_restores_indexes(review):
+    results = indexes_scenario(1)
+    assert {'reviews', 'reviews_no_index', 'comments_no_index'} <= set(
+        results
+    )
+    with connection.cursor() as cursor:
+        indexes = {
+            *connection.introspection.get_constraints(
+                cursor, Review._meta.db_table),
+            *connection.introspection.get_constraints(
+                cursor, Comment._meta.db_table),
+        }
+    assert {'review_title_pub_date_idx', 'review_title_score_idx',
+            'comment_review_pub_date_idx'} <= indexes, (
+        'Проверьте, что после замера без индексов они создаются заново.'
+    )
@@ -0,0 +1,82 @@
+from django.db import IntegrityError
+import pytest
+
+from reviews.models import Genre, GenreTitle, Title
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22GenreTitle:
+
+    def test_01_api_writes_genre_title(self, admin_client):
+        titles, _, genres = create_titles(admin_client)
+        assert set(GenreTitle.objects.filter(
+            title_id=titles[0]['id']
+        ).values_list('genre__slug', flat=True)) == set(titles[0]['genre']), (
+            'Проверьте, что жанры произведения, созданного через API, '
+            'хранятся в GenreTitle.'
+        )
+        admin_client.patch(f'/api/v1/titles/{titles[0]["id"]}/',
+                           data={'genre': [genres[2]['slug']]})
+        assert list(GenreTitle.objects.filter(
+            title_id=titles[0]['id']
+        ).values_list('genre__slug', flat=True)) == [genres[2]['slug']]
+
+    def test_02_api_reads_genre_title(self, client, admin_client):
+        titles, _, genres = create_titles(admin_client)
+        title = Title.objects.get(pk=titles[1]['id'])
+        # так связи записывают import_csv и generate_data
+        GenreTitle.objects.create(title=title,
+                                  genre=Genre.objects.get(slug='comedy'))
+        response = client.get('/api/v1/titles/?genre=comedy')
+        assert {item['id'] for item in response.json()['results']} == {
+            titles[0]['id'], titles[1]['id']
+        }, (
+            'Проверьте, что фильтр по жанру видит связи, записанные '
+            'напрямую в GenreTitle.'
+        )
+        response = client.get(f'/api/v1/titles/{title.pk}/')
+        assert {genre['slug'] for genre in response.json()['genre']} == {
+            genres[2]['slug'], 'comedy'
+        }
+
+    def test_03_unique(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        link = GenreTitle.objects.filter(title_id=titles[0]['id']).first()
+        with pytest.raises(IntegrityError):
+            GenreTitle.objects.create(title_id=link.title_id,
+                                      genre_id=link.genre_id)
+
+    def test_04_direct_writes_change_title(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        title = Title.objects.get(pk=titles[1]['id'])
+
+        def modified():
+            return Title.objects.get(pk=title.pk).modified
+
+        before = modified()
+        link = GenreTitle.objects.create(
+            title=title, genre=Genre.objects.get(slug='comedy')
+        )
+        assert modified() > before, (
+            'Проверьте, что связь с жанром, записанная напрямую в '
+            'GenreTitle (например, из админки), меняет дату изменения '
+            'произведения.'
+        )
+        before = modified()
+        link.delete()
+        assert modified() > before
+        before = modified()
+        GenreTitle.objects.filter(title=title).delete()
+        assert modified() > before
+
+    def test_05_indexes(self):
+        plan = Title.objects.filter(genre__slug='drama').explain()
+        assert 'COVERING INDEX genre_title_genre_idx' in plan, (
+            f'Проверьте, что фильтр по жанру идёт по индексу. План:\n{plan}'
+        )
+        plan = GenreTitle.objects.filter(title_id__in=[1, 2]).explain()
+        assert 'COVERING INDEX' in plan, (
+            'Проверьте, что жанры произведений выбираются по индексу. '
+            f'План:\n{plan}'
+        )
@@ -0,0 +1,91 @@
+from http import HTTPStatus
+
+import pytest
+from rest_framework.pagination import PageNumberPagination
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.fixture
+def many_titles():
+    categories = [
+        Category.objects.create(name=f'Категория {i}', slug=f'category-{i}')
+        for i in range(3)
+    ]
+    genres = [
+        Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+        for i in range(4)
+    ]
+    titles = []
+    for i in range(12):
+        title = Title.objects.create(
+            name=f'Произведение {i}', year=2000 + i,
+            description='описание', category=categories[i % 3]
+        )
+        # чётные: genre-0..2, нечётные: genre-1..3
+        title.genre.set(genres[i % 2:i % 2 + 3])
+        titles.append(title)
+    return titles
+
+
+def ids(titles, condition):
+    return {title.pk for i, title in enumerate(titles) if condition(i)}
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23TitleFilters:
+
+    # count + страница произведений с категориями + жанры страницы
+    LIST_QUERIES = 3
+
+    def get_ids(self, client, query, django_assert_max_num_queries):
+        with django_assert_max_num_queries(self.LIST_QUERIES):
+            response = client.get(f'/api/v1/titles/?{query}')
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        result = [item['id'] for item in data['results']]
+        assert len(result) == len(set(result)) == data['count'], (
+            f'Проверьте, что фильтр `{query}` не дублирует произведения.'
+        )
+        return set(result)
+
+    @pytest.mark.parametrize('query, condition', (
+        ('genre=genre-0', lambda i: i % 2 == 0),
+        ('genre=genre-0,genre-3', lambda i: True),
+        ('genre=genre-1,genre-2', lambda i: True),
+        ('genre=genre-0,genre-3&match=any', lambda i: True),
+        ('genre=genre-0,genre-1&match=all', lambda i: i % 2 == 0),
+        ('genre=genre-0,genre-3&match=all', lambda i: False),
+        ('genre=genre-1,genre-1&match=all', lambda i: True),
+        ('category=category-0,category-1', lambda i: i % 3 != 2),
+        ('year_min=2005&year_max=2008', lambda i: 5 <= i <= 8),
+        ('category=category-0&year_min=2003', lambda i: i in (3, 6, 9)),
+        ('genre=genre-3&category=category-0&year_max=2009',
+         lambda i: i in (3, 9)),
+    ))
+    def test_01_filters(self, client, many_titles, query, condition,
+                        django_assert_max_num_queries, monkeypatch):
+        monkeypatch.setattr(PageNumberPagination, 'page_size', 100)
+        assert self.get_ids(
+            client, query, django_assert_max_num_queries
+        ) == ids(many_titles, condition), (
+            f'Проверьте, что фильтр `{query}` возвращает нужные '
+            'произведения.'
+        )
+
+    def test_02_invalid_match(self, client, many_titles):
+        response = client.get('/api/v1/titles/?genre=genre-0&match=some')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что при неизвестном значении `match` возвращается '
+            'ответ со статусом 400.'
+        )
+
+    def test_03_category_year_index(self):
+        plan = Title.objects.filter(
+            category__slug__in=['category-0', 'category-1'],
+            year__gte=2000, year__lte=2005,
+        ).explain()
+        assert 'title_category_year_idx' in plan, (
+            'Проверьте, что фильтр по категории и годам идёт по индексу. '
+            f'План:\n{plan}'
+        )
@@ -0,0 +1,158 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import (Category, Genre, GenreTitle, LeaderboardEntry,
+                            Review, Title, User)
+from reviews.signals import bulk_changed
+
+
+@pytest.fixture
+def ranked(settings):
+    settings.LEADERBOARD_MIN_REVIEWS = 2
+    categories = [
+        Category.objects.create(name=f'Категория {i}', slug=f'category-{i}')
+        for i in range(2)
+    ]
+    genres = [Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+              for i in range(3)]
+    users = [User.objects.create(username=f'user{i}',
+                                 email=f'user{i}@yamdb.fake')
+             for i in range(4)]
+    titles = []
+    for i in range(6):
+        title = Title.objects.create(name=f'Произведение {i}', year=2000,
+                                     description='',
+                                     category=categories[i % 2])
+        title.genre.set(genres[i % 3:i % 3 + 2])
+        titles.append(title)
+    # у произведения i отзывов i % 4, оценки растут с номером
+    for i, title in enumerate(titles):
+        for user in users[:i % 4]:
+            Review.objects.create(title=title, author=user, text='Отзыв',
+                                  score=i + 1)
+    return titles, categories, genres, users
+
+
+def expected_entries(min_reviews):
+    """Топы, посчитанные заново по текущим оценкам произведений."""
+    entries = set()
+    for title in Title.objects.prefetch_related('genre'):
+        if title.rating_count < min_reviews:
+            continue
+        rating = round(title.rating_sum / title.rating_count, 6)
+        scopes = [(None, None)]
+        if title.category_id:
+            scopes.append((title.category_id, None))
+        scopes.extend((None, genre.pk) for genre in title.genre.all())
+        entries.update((title.pk, category, genre, rating, title.rating_count)
+                       for category, genre in scopes)
+    return entries
+
+
+def stored_entries():
+    return {(title, category, genre, round(rating, 6), count)
+            for title, category, genre, rating, count in
+            LeaderboardEntry.objects.values_list(
+                'title', 'category', 'genre', 'rating', 'rating_count')}
+
+
+def check_entries(settings, action):
+    assert stored_entries() == expected_entries(
+        settings.LEADERBOARD_MIN_REVIEWS
+    ), f'Проверьте, что топы обновляются после изменения: {action}.'
+
+
+@pytest.mark.django_db(transaction=True)
+class Test24Leaderboard:
+
+    def test_01_incremental(self, ranked, settings):
+        titles, categories, genres, users = ranked
+        check_entries(settings, 'создание отзывов')
+        Review.objects.create(title=titles[1], author=users[3], text='Отзыв',
+                              score=10)
+        check_entries(settings, 'отзыв, доводящий до порога')
+        review = Review.objects.filter(title=titles[3]).first()
+        review.score = 1
+        review.save()
+        check_entries(settings, 'изменение оценки')
+        review.title = titles[4]
+        review.save()
+        check_entries(settings, 'перенос отзыва')
+        Review.objects.filter(title=titles[2]).first().delete()
+        check_entries(settings, 'удаление отзыва ниже порога')
+        # рейтинг обновляется в базе, объект надо перечитать
+        title = Title.objects.get(pk=titles[3].pk)
+        title.category = categories[0]
+        title.save()
+        check_entries(settings, 'смена категории')
+        title.category = None
+        title.save()
+        check_entries(settings, 'удаление категории произведения')
+        title.genre.set(genres[2:])
+        check_entries(settings, 'смена жанров')
+        title.genre.clear()
+        check_entries(settings, 'очистка жанров')
+        genres[0].titles.add(titles[3], titles[5])
+        check_entries(settings, 'добавление произведений жанру')
+        genres[0].titles.clear()
+        check_entries(settings, 'очистка произведений жанра')
+        link = GenreTitle.objects.create(title=titles[3], genre=genres[2])
+        check_entries(settings, 'связь с жанром, записанная напрямую')
+        link.genre = genres[0]
+        link.save()
+        check_entries(settings, 'изменение связи с жанром напрямую')
+        link.delete()
+        check_entries(settings, 'удаление связи с жанром напрямую')
+        GenreTitle.objects.create(title=titles[3], genre=genres[2])
+        GenreTitle.objects.filter(genre=genres[2]).delete()
+        check_entries(settings, 'массовое удаление связей с жанром')
+        genres[1].delete()
+        check_entries(settings, 'удаление жанра')
+        categories[1].delete()
+        check_entries(settings, 'удаление категории')
+        users[0].delete()
+        check_entries(settings, 'удаление пользователя с отзывами')
+        titles[5].delete()
+        check_entries(settings, 'удаление произведения')
+        GenreTitle.objects.bulk_create(
+            [GenreTitle(title=titles[1], genre=genres[0])]
+        )
+        bulk_changed.send(sender=GenreTitle)
+        check_entries(settings, 'массовая запись связей с жанрами')
+
+    def test_02_top(self, client, ranked):
+        titles, categories, genres, _ = ranked
+        response = client.get('/api/v1/titles/top/')
+        assert response.status_code == HTTPStatus.OK
+        assert [title['id'] for title in response.json()] == [
+            titles[3].pk, titles[2].pk
+        ], (
+            'Проверьте, что `/api/v1/titles/top/` возвращает произведения '
+            'с не меньше LEADERBOARD_MIN_REVIEWS оценками по убыванию '
+            'рейтинга.'
+        )
+        assert response.json()[0]['rating'] == 4
+        response = client.get(
+            f'/api/v1/titles/top/?category={categories[1].slug}&limit=1'
+        )
+        assert [title['id'] for title in response.json()] == [titles[3].pk]
+        response = client.get(f'/api/v1/titles/top/?genre={genres[0].slug}')
+        assert [title['id'] for title in response.json()] == [titles[3].pk]
+
+    @pytest.mark.parametrize('query', (
+        'genre=unknown', 'limit=0', 'limit=1000',
+        'genre=genre-0&category=category-0',
+    ))
+    def test_03_invalid(self, client, ranked, query):
+        response = client.get(f'/api/v1/titles/top/?{query}')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'Проверьте, что запрос `/api/v1/titles/top/?{query}` '
+            'возвращает ответ со статусом 400.'
+        )
+
+    def test_04_index(self, ranked):
+        plan = LeaderboardEntry.objects.top(genre=ranked[2][0])[:10].explain()
+        assert 'leaderboard_top_idx' in plan and 'TEMP B-TREE' not in plan, (
+            f'Проверьте, что топ читается по индексу. План:\n{plan}'
+        )
@@ -0,0 +1,92 @@
+from collections import Counter
+from http import HTTPStatus
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+
+from reviews.models import Review, Title, User
+
+
+@pytest.fixture
+def scored():
+    users = [User.objects.create(username=f'user{i}',
+                                 email=f'user{i}@yamdb.fake')
+             for i in range(5)]
+    titles = [Title.objects.create(name=f'Произведение {i}', year=2000,
+                                   description='')
+              for i in range(2)]
+    for user, score in zip(users, (1, 4, 4, 9, 10)):
+        Review.objects.create(title=titles[0], author=user, text='Отзыв',
+                              score=score)
+    return titles, users
+
+
+def check_histogram(action):
+    for title in Title.objects.all():
+        expected = Counter(title.reviews.values_list('score', flat=True))
+        assert title.score_histogram == {
+            score: expected[score] for score in range(1, 11)
+        }, f'Проверьте, что гистограмма оценок обновляется: {action}.'
+
+
+@pytest.mark.django_db(transaction=True)
+class Test25ScoreHistogram:
+
+    def test_01_counters(self, scored):
+        titles, users = scored
+        check_histogram('создание отзывов')
+        review = Review.objects.get(title=titles[0], author=users[0])
+        review.score = 7
+        review.save()
+        check_histogram('изменение оценки')
+        review.title = titles[1]
+        review.save()
+        check_histogram('перенос отзыва')
+        Review.objects.get(title=titles[0], author=users[1]).delete()
+        check_histogram('удаление отзыва')
+        users[2].delete()
+        check_histogram('удаление пользователя')
+        Title.objects.update(score_9=0, score_10=0)
+        Title.objects.refresh_ratings()
+        check_histogram('пересчёт рейтинга')
+
+    def test_02_median(self, scored):
+        titles, users = scored
+        title = Title.objects.get(pk=titles[0].pk)
+        assert title.median_score == 4
+        assert title.rating_count == sum(title.score_histogram.values())
+        Review.objects.get(title=titles[0], author=users[0]).delete()
+        assert Title.objects.get(pk=titles[0].pk).median_score == 6.5, (
+            'Проверьте, что при чётном числе оценок медиана — среднее двух '
+            'средних оценок.'
+        )
+        Review.objects.get(title=titles[0], author=users[4]).delete()
+        assert Title.objects.get(pk=titles[0].pk).median_score == 4
+        assert Title.objects.get(pk=titles[1].pk).median_score is None
+
+    def test_03_api(self, client, scored):
+        title = scored[0][0]
+        url = f'/api/v1/titles/{title.pk}/'
+        with CaptureQueriesContext(connection) as plain:
+            response = client.get(url)
+        assert 'score_histogram' not in response.json(), (
+            'Проверьте, что гистограмма оценок выводится только по запросу '
+            '`?expand=score_histogram`.'
+        )
+        with CaptureQueriesContext(connection) as expanded:
+            response = client.get(f'{url}?expand=score_histogram')
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert data['score_histogram'] == {
+            '1': 1, '2': 0, '3': 0, '4': 2, '5': 0, '6': 0, '7': 0, '8': 0,
+            '9': 1, '10': 1,
+        }
+        assert data['median_score'] == 4 and data['rating'] == 5
+        assert len(expanded) == len(plain), (
+            'Проверьте, что гистограмма оценок не требует дополнительных '
+            'SQL-запросов.'
+        )
+        response = client.get('/api/v1/titles/?expand=score_histogram')
+        assert all('score_histogram' in item
+                   for item in response.json()['results'])
@@ -0,0 +1,80 @@
+from http import HTTPStatus
+
+from django.db import connection
+import pytest
+
+from reviews.models import Title
+from reviews.search import TITLE_INDEX, match_expression, restore_triggers
+
+
+@pytest.fixture
+def titles():
+    return [
+        Title.objects.create(name='Война и мир', year=1900,
+                             description='Роман Толстого'),
+        Title.objects.create(name='Мир Дикого Запада', year=2016,
+                             description='Сериал'),
+        Title.objects.create(name='Тихий Дон', year=1940,
+                             description='Роман о войне и мире'),
+    ]
+
+
+def search(client, query):
+    response = client.get('/api/v1/titles/', {'q': query})
+    assert response.status_code == HTTPStatus.OK
+    return [item['name'] for item in response.json()['results']]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test26TitleSearch:
+
+    def test_01_match_expression(self):
+        assert match_expression('Война  и мир') == '"Война"* "и"* "мир"*'
+        assert match_expression('NEAR("a" b*) OR') == '"NEAR"* "a"* "b"* "OR"*'
+        assert match_expression(' "*( ') is None
+
+    def test_02_search(self, client, titles):
+        assert search(client, 'мир') == [
+            'Мир Дикого Запада', 'Война и мир', 'Тихий Дон'
+        ], (
+            'Проверьте, что `?q=` ищет по названию и описанию и ставит '
+            'совпадения в названии выше.'
+        )
+        assert search(client, 'войн') == ['Война и мир', 'Тихий Дон'], (
+            'Проверьте, что `?q=` ищет слова по префиксу.'
+        )
+        assert search(client, 'РОМАН толст') == ['Война и мир']
+        assert search(client, '"*(') == []
+
+    def test_03_sync(self, client, titles):
+        titles[0].name = 'Анна Каренина'
+        titles[0].save()
+        assert search(client, 'карен') == ['Анна Каренина']
+        assert search(client, 'война') == []
+        Title.objects.filter(pk=titles[1].pk).update(description='вестерн')
+        assert search(client, 'вестерн') == ['Мир Дикого Запада'], (
+            'Проверьте, что индекс обновляется и при записи в обход save().'
+        )
+        titles[0].delete()
+        assert search(client, 'карен') == []
+        Title.objects.bulk_create([Title(name='Белая гвардия', year=1925,
+                                         description='')])
+        assert search(client, 'гвард') == ['Белая гвардия']
+
+    def test_04_restore_triggers(self, client, titles):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {TITLE_INDEX.table}_insert')
+        restore_triggers(sender=None, using='default')
+        Title.objects.create(name='Мастер и Маргарита', year=1966,
+                             description='')
+        assert search(client, 'маргарит') == ['Мастер и Маргарита'], (
+            'Проверьте, что после миграций триггеры поиска создаются '
+            'заново.'
+        )
+
+    def test_05_plan(self, titles):
+        plan = TITLE_INDEX.search(Title.objects.all(), 'мир').explain()
+        assert ('reviews_title_fts VIRTUAL TABLE INDEX' in plan
+                and 'reviews_title USING INTEGER PRIMARY KEY' in plan), (
+            f'Проверьте, что поиск идёт по индексу FTS5. План:\n{plan}'
+        )
@@ -0,0 +1,133 @@
+from datetime import datetime
+from http import HTTPStatus
+
+from django.utils import timezone
+import pytest
+
+from reviews.models import Comment, Review, Title, User
+
+
+@pytest.fixture
+def texts():
+    users = [User.objects.create(username=f'user{i}',
+                                 email=f'user{i}@yamdb.fake')
+             for i in range(2)]
+    titles = [Title.objects.create(name=f'Произведение {i}', year=2000,
+                                   description='')
+              for i in range(2)]
+    reviews = [
+        Review.objects.create(title=titles[0], author=users[0], score=8,
+                              text='Сюжет затянут, но финал спасает'),
+        Review.objects.create(title=titles[1], author=users[1], score=3,
+                              text='Скучный сюжет и плохая игра актёров'),
+    ]
+    comments = [
+        Comment.objects.create(review=reviews[0], author=users[1],
+                               text='Финал предсказуем'),
+        Comment.objects.create(review=reviews[1], author=users[0],
+                               text='Про сюжет не согласен'),
+    ]
+    return users, titles, reviews, comments
+
+
+def search(client, **params):
+    response = client.get('/api/v1/search/', params)
+    assert response.status_code == HTTPStatus.OK, response.json()
+    return response.json()
+
+
+def found(client, **params):
+    return {(hit['type'], hit['id'])
+            for hit in search(client, **params)['results']}
+
+
+@pytest.mark.django_db(transaction=True)
+class Test27TextSearch:
+
+    def test_01_hits(self, client, texts):
+        users, titles, reviews, comments = texts
+        data = search(client, q='финал')
+        assert data['count'] == 2
+        assert data['results'] == [
+            {'type': 'comment', 'id': comments[0].pk, 'title': titles[0].pk,
+             'review': reviews[0].pk, 'author': users[1].username,
+             'pub_date': data['results'][0]['pub_date'],
+             'snippet': '<b>Финал</b> предсказуем'},
+            {'type': 'review', 'id': reviews[0].pk, 'title': titles[0].pk,
+             'review': None, 'author': users[0].username,
+             'pub_date': data['results'][1]['pub_date'],
+             'snippet': 'Сюжет затянут, но <b>финал</b> спасает'},
+        ], (
+            'Проверьте, что `/search/` находит отзывы и комментарии, '
+            'упорядочивает их по релевантности и выделяет найденные слова.'
+        )
+        assert found(client, q='сюж', type='review') == {
+            ('review', reviews[0].pk), ('review', reviews[1].pk)
+        }, 'Проверьте, что `type` оставляет только отзывы или комментарии.'
+        assert found(client, q='сюжет', type='comment') == {
+            ('comment', comments[1].pk)
+        }
+        assert found(client, q='"(') == set()
+
+    def test_02_scope(self, client, texts):
+        users, titles, reviews, comments = texts
+        assert found(client, q='сюжет', title=titles[1].pk) == {
+            ('review', reviews[1].pk), ('comment', comments[1].pk)
+        }, 'Проверьте, что `title` ищет и в комментариях к отзывам.'
+        assert found(client, q='сюжет', author=users[0].username) == {
+            ('review', reviews[0].pk), ('comment', comments[1].pk)
+        }
+        old = timezone.make_aware(datetime(2020, 5, 17, 23, 59))
+        Review.objects.filter(pk=reviews[0].pk).update(pub_date=old)
+        Comment.objects.filter(pk=comments[1].pk).update(pub_date=old)
+        assert found(client, q='сюжет', date_from='2020-05-17',
+                     date_to='2020-05-17') == {
+            ('review', reviews[0].pk), ('comment', comments[1].pk)
+        }, 'Проверьте, что `date_to` включает весь последний день.'
+        assert found(client, q='сюжет', date_from='2020-05-18') == {
+            ('review', reviews[1].pk)
+        }
+
+    def test_03_sync(self, client, texts):
+        users, titles, reviews, comments = texts
+        reviews[1].text = 'Отличная игра актёров'
+        reviews[1].save()
+        assert found(client, q='скучн') == set()
+        assert found(client, q='отличн') == {('review', reviews[1].pk)}
+        Comment.objects.bulk_create([
+            Comment(review=reviews[1], author=users[1], text='Отличная')
+        ])
+        assert search(client, q='отличн')['count'] == 2, (
+            'Проверьте, что индекс обновляется и при записи в обход save().'
+        )
+        titles[1].delete()
+        assert found(client, q='отличн') == set(), (
+            'Проверьте, что удалённые каскадом отзывы и комментарии '
+            'пропадают из поиска.'
+        )
+
+    def test_04_snippet_escaping(self, client, texts):
+        users, titles, reviews, comments = texts
+        Comment.objects.create(review=reviews[0], author=users[0],
+                               text='<script>alert(1)</script> & финал')
+        snippets = {hit['snippet'] for hit in search(client, q='финал',
+                                                     type='comment')['results']}
+        assert '&lt;script&gt;alert(1)&lt;/script&gt; &amp; <b>финал</b>' in (
+            snippets
+        ), 'Проверьте, что текст фрагмента экранирован для HTML.'
+
+    def test_05_validation(self, client, texts):
+        assert client.get('/api/v1/search/').status_code == (
+            HTTPStatus.BAD_REQUEST
+        )
+        for params in ({'q': 'сюжет', 'type': 'title'},
+                       {'q': 'сюжет', 'date_from': '2020-02-02',
+                        'date_to': '2020-02-01'}):
+            response = client.get('/api/v1/search/', params)
+            assert response.status_code == HTTPStatus.BAD_REQUEST, params
+
+    def test_06_queries(self, client, texts, django_assert_num_queries):
+        # число строк отзывов и комментариев, страница, фрагменты
+        # отзывов и комментариев
+        with django_assert_num_queries(5):
+            search(client, q='сюжет')
@@ -0,0 +1,130 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import transaction
+import pytest
+
+from api.autocomplete import CHANGE_KEY, TITLE_NAMES, VERSION_KEY, PrefixIndex
+from reviews.models import Title
+from reviews.signals import bulk_changed
+
+
+@pytest.fixture
+def titles():
+    return [Title.objects.create(name=name, year=2000, description='')
+            for name in ('Мастер и Маргарита', 'Мастерская', 'матрица',
+                         'Марсианин', 'Master of Puppets')]
+
+
+def complete(client, prefix, **params):
+    response = client.get('/api/v1/titles/autocomplete/',
+                          {'prefix': prefix, **params})
+    assert response.status_code == HTTPStatus.OK
+    return [item['name'] for item in response.json()]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test28Autocomplete:
+
+    def test_01_lookup(self, client, titles, django_assert_num_queries):
+        response = client.get('/api/v1/titles/autocomplete/',
+                              {'prefix': 'МАТ'})
+        assert response.json() == [{'id': titles[2].pk, 'name': 'матрица'}], (
+            'Проверьте, что автодополнение не зависит от регистра и '
+            'возвращает только id и название.'
+        )
+        with django_assert_num_queries(0):
+            assert complete(client, 'мас') == ['Мастер и Маргарита',
+                                               'Мастерская']
+        assert complete(client, 'ма', limit=2) == ['Марсианин',
+                                                   'Мастер и Маргарита']
+        assert complete(client, 'mast') == ['Master of Puppets']
+        assert complete(client, 'Маргарита') == []
+
+    def test_02_changes(self, client, titles, django_assert_num_queries):
+        complete(client, 'м')
+        titles[2].name = 'Солярис'
+        titles[2].save()
+        titles[0].delete()
+        Title.objects.create(name='Мартин Иден', year=1909, description='')
+        with django_assert_num_queries(0):
+            assert complete(client, 'м') == [
+                'Марсианин', 'Мартин Иден', 'Мастерская'
+            ], (
+                'Проверьте, что индекс обновляется при создании, '
+                'переименовании и удалении произведений без перестроения.'
+            )
+            assert complete(client, 'сол') == ['Солярис']
+
+    def test_03_rollback(self, client, titles):
+        complete(client, 'м')
+        with pytest.raises(ValueError):
+            with transaction.atomic():
+                Title.objects.create(name='Мартин Иден', year=1909,
+                                     description='')
+                raise ValueError
+        assert 'Мартин Иден' not in complete(client, 'мар'), (
+            'Проверьте, что изменения отменённых транзакций не попадают '
+            'в индекс.'
+        )
+
+    def test_04_other_process(self, titles, django_assert_num_queries):
+        other = PrefixIndex()
+        assert [name for _, name in other.lookup('мас', 10)] == [
+            'Мастер и Маргарита', 'Мастерская'
+        ]
+        titles[1].name = 'Марсианские хроники'
+        titles[1].save()
+        with django_assert_num_queries(0):
+            assert [name for _, name in other.lookup('мар', 10)] == [
+                'Марсианин', 'Марсианские хроники'
+            ], (
+                'Проверьте, что другие процессы применяют изменения '
+                'из журнала в кэше.'
+            )
+        titles[3].delete()
+        cache.delete(CHANGE_KEY.format(version=other.version + 1))
+        with django_assert_num_queries(1):
+            assert [name for _, name in other.lookup('мар', 10)] == [
+                'Марсианские хроники'
+            ], 'Проверьте, что при неполном журнале индекс строится заново.'
+
+    def test_05_version_collision(self, titles):
+        other = PrefixIndex()
+        other.lookup('м', 10)
+        # другой процесс уже записал изменение под следующим номером
+        cache.incr(VERSION_KEY)
+        cache.set(CHANGE_KEY.format(version=other.version + 1),
+                  (titles[0].pk, 'Солярис'))
+        cache.set(VERSION_KEY, other.version)
+        titles[1].name = 'Сталкер'
+        titles[1].save()
+        assert [name for _, name in other.lookup('с', 10)] == [
+            'Солярис', 'Сталкер'
+        ], 'Проверьте, что изменения с одним номером версии не теряются.'
+
+    def test_06_bulk(self, client, titles):
+        complete(client, 'м')
+        Title.objects.bulk_create([Title(name='Мартин Иден', year=1909,
+                                         description='')])
+        bulk_changed.send(sender=Title)
+        assert 'Мартин Иден' in complete(client, 'мар')
+
+    def test_07_bulk_scope(self, client, titles,
+                           django_assert_num_queries):
+        complete(client, 'м')
+        Title.objects.filter(pk=titles[3].pk).update(name='Мартин Иден')
+        bulk_changed.send(sender=Title, title_ids={titles[3].pk})
+        with django_assert_num_queries(0):
+            assert complete(client, 'мар') == ['Мартин Иден'], (
+                'Проверьте, что немногие изменения массовой записи '
+                'применяются без перестроения индекса.'
+            )
+
+    def test_08_validation(self, client):
+        url = '/api/v1/titles/autocomplete/'
+        assert client.get(url).status_code == HTTPStatus.BAD_REQUEST
+        assert client.get(url, {'prefix': 'м', 'limit': 1000}).status_code == (
+            HTTPStatus.BAD_REQUEST
+        )
+        assert TITLE_NAMES.lookup('м', 10) == []
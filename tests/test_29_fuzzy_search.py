@@ -0,0 +1,90 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Title, TitleTrigram
+from reviews.search import normalize, similarity, trigrams
+from reviews.signals import bulk_changed
+
+
+@pytest.fixture
+def titles():
+    return [Title.objects.create(name=name, year=2000, description='')
+            for name in ('Мастер и Маргарита', 'Преступление и наказание',
+                         'Master of Puppets', 'Мартин Иден')]
+
+
+def fuzzy(client, query):
+    response = client.get('/api/v1/titles/', {'fuzzy': query})
+    assert response.status_code == HTTPStatus.OK
+    return [item['name'] for item in response.json()['results']]
+
+
+def stored(title):
+    return set(TitleTrigram.objects.filter(title=title)
+               .values_list('trigram', flat=True))
+
+
+@pytest.mark.django_db(transaction=True)
+class Test29FuzzySearch:
+
+    def test_01_trigrams(self):
+        assert normalize('Ёжик в тумане') == 'ezhik v tumane'
+        assert normalize('Amélie') == 'amelie'
+        assert trigrams('Кот') == {'  k', ' ko', 'kot', 'ot '}
+        assert trigrams('Мастер') == trigrams('master'), (
+            'Проверьте, что кириллица приводится к латинице.'
+        )
+        assert trigrams(' !? ') == set()
+        assert similarity(trigrams('кот'), trigrams('кот')) == 1.0
+        assert similarity(trigrams('кот'), trigrams('пёс')) == 0.0
+
+    def test_02_search(self, client, titles):
+        assert fuzzy(client, 'Мастр и Маргаритта')[0] == (
+            'Мастер и Маргарита'
+        ), 'Проверьте, что `?fuzzy=` находит названия с опечатками.'
+        assert fuzzy(client, 'prestuplenie i nakazanie') == [
+            'Преступление и наказание'
+        ], 'Проверьте, что `?fuzzy=` находит названия, записанные латиницей.'
+        assert fuzzy(client, 'Master of Pupets') == ['Master of Puppets']
+        assert fuzzy(client, 'Война') == []
+        assert fuzzy(client, '?!') == []
+
+    def test_03_index(self, titles):
+        assert stored(titles[0]) == trigrams('Мастер и Маргарита')
+        titles[0].name = 'Мастер'
+        titles[0].save()
+        assert stored(titles[0]) == trigrams('Мастер'), (
+            'Проверьте, что триграммы обновляются при переименовании.'
+        )
+        title = Title.objects.get(pk=titles[1].pk)
+        title.name = 'Идиот'
+        title.save()
+        assert stored(title) == trigrams('Идиот')
+        titles[3].delete()
+        assert not TitleTrigram.objects.filter(title_id=titles[3].pk).exists()
+
+    def test_04_bulk(self, client, titles):
+        Title.objects.filter(pk=titles[3].pk).update(name='Белая гвардия')
+        Title.objects.bulk_create([Title(name='Бесы', year=1872,
+                                         description='')])
+        bulk_changed.send(sender=Title)
+        assert fuzzy(client, 'Белая гвардея') == ['Белая гвардия']
+        assert fuzzy(client, 'Бесы') == ['Бесы']
+        assert fuzzy(client, 'Мартин Иден') == []
+
+    def test_05_bulk_scope(self, client, titles):
+        Title.objects.filter(pk__in=[titles[2].pk, titles[3].pk]).update(
+            name='Белая гвардия'
+        )
+        bulk_changed.send(sender=Title, title_ids={titles[3].pk})
+        assert fuzzy(client, 'Белая гвардея') == ['Белая гвардия'], (
+            'Проверьте, что массовая запись с title_ids перестраивает '
+            'триграммы только этих произведений.'
+        )
+        assert stored(titles[2]) == trigrams('Master of Puppets')
+
+    def test_06_queries(self, client, titles, django_assert_num_queries):
+        # кандидаты с названиями, число найденных, страница, жанры
+        with django_assert_num_queries(4):
+            fuzzy(client, 'Мастр и Маргаритта')